@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+aiohttp streaming reverse proxy
+Usage: python3 aio_proxy.py
+   or: gunicorn aio_proxy:app -k aiohttp.GunicornWebWorker -w $(nproc) -b 0.0.0.0:8080
+"""
+
+try:
+    import aiohttp
+    from aiohttp import web
+except ImportError:
+    print("aiohttp not installed. Install with: pip3 install aiohttp")
+    exit(1)
+
+# Configuration
+BACKEND = "http://127.0.0.1:8081"
+PORT = 8080
+CHUNK_SIZE = 65536
+
+# Hop-by-hop headers must not be forwarded; the connector owns the connection
+HOP_BY_HOP = frozenset({
+    'connection',
+    'keep-alive',
+    'proxy-authenticate',
+    'proxy-authorization',
+    'te',
+    'trailers',
+    'transfer-encoding',
+    'upgrade',
+})
+
+# Host is set from the backend URL
+REQUEST_SKIP = HOP_BY_HOP | {'host'}
+
+
+def _filter(headers, skip):
+    """Copy headers, leaving out the ones in skip"""
+    return [(k, v) for k, v in headers.items() if k.lower() not in skip]
+
+
+async def proxy(request):
+    """Forward a request to the backend and stream the response back"""
+    session = request.app['session']
+    data = request.content if request.body_exists else None
+
+    async with session.request(
+        request.method,
+        BACKEND + request.path_qs,
+        headers=_filter(request.headers, REQUEST_SKIP),
+        data=data,
+        allow_redirects=False
+    ) as upstream:
+        response = web.StreamResponse(
+            status=upstream.status,
+            reason=upstream.reason,
+            headers=_filter(upstream.headers, HOP_BY_HOP)
+        )
+        await response.prepare(request)
+        async for chunk in upstream.content.iter_chunked(CHUNK_SIZE):
+            await response.write(chunk)
+        await response.write_eof()
+        return response
+
+
+async def on_startup(app):
+    """Create the shared client session (keep-alive pool + DNS cache)"""
+    app['session'] = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=0,
+            limit_per_host=256,
+            use_dns_cache=True,
+            ttl_dns_cache=300,
+            keepalive_timeout=30
+        ),
+        # Relay bodies exactly as the backend encoded them
+        auto_decompress=False
+    )
+
+
+async def on_cleanup(app):
+    """Close the shared client session"""
+    await app['session'].close()
+
+
+def create_app():
+    """Build the proxy application"""
+    app = web.Application()
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_route('*', '/{path:.*}', proxy)
+    return app
+
+
+app = create_app()
+
+if __name__ == '__main__':
+    print(f"aiohttp Proxy Server")
+    print(f"Listening on: http://0.0.0.0:{PORT}")
+    print(f"Backend: {BACKEND}")
+    print("-" * 50)
+    web.run_app(app, host='0.0.0.0', port=PORT)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+TTL cache for socket.getaddrinfo
+Call install() before importing requests/urllib3 so their connections
+resolve through the cache. Set DNS_CACHE_IPV4_ONLY=1 to skip the (sometimes
+very slow) AAAA lookup, and DNS_CACHE_TTL to change the lifetime in seconds.
+"""
+
+import os
+import socket
+import time
+
+DNS_CACHE_TTL = float(os.environ.get('DNS_CACHE_TTL', 300))
+DNS_CACHE_MAX_ENTRIES = 256
+IPV4_ONLY = os.environ.get('DNS_CACHE_IPV4_ONLY', '0') not in ('', '0')
+
+# (host, port, family, type, proto, flags) -> (expiry, addrinfo list)
+_CACHE = {}
+_original_getaddrinfo = socket.getaddrinfo
+
+
+def _cached_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+    """Drop-in replacement for socket.getaddrinfo that caches results"""
+    if IPV4_ONLY and family == socket.AF_UNSPEC:
+        family = socket.AF_INET
+
+    key = (host, port, family, type, proto, flags)
+    now = time.monotonic()
+    entry = _CACHE.get(key)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    result = _original_getaddrinfo(host, port, family, type, proto, flags)
+
+    # Evict the oldest entry once full (dicts keep insertion order)
+    _CACHE.pop(key, None)
+    if len(_CACHE) >= DNS_CACHE_MAX_ENTRIES:
+        _CACHE.pop(next(iter(_CACHE)), None)
+    _CACHE[key] = (now + DNS_CACHE_TTL, result)
+    return result
+
+
+def install():
+    """Route all socket.getaddrinfo calls through the cache"""
+    global _original_getaddrinfo
+    if socket.getaddrinfo is not _cached_getaddrinfo:
+        # Wrap whatever is current, e.g. gevent's cooperative resolver
+        _original_getaddrinfo = socket.getaddrinfo
+        socket.getaddrinfo = _cached_getaddrinfo
@@ -1,40 +1,134 @@
 #!/usr/bin/env python3
 
+import os
+from urllib.parse import urlsplit
+
+# Must be installed before urllib3 is imported so it resolves through the cache
+import dns_cache
+dns_cache.install()
+
 try:
     from flask import Flask, request, Response
-    import requests
+    import urllib3
 except ImportError:
-    print("Flask not installed. Install with: pip3 install flask requests")
+    print("Flask not installed. Install with: pip3 install flask urllib3")
     exit(1)
 
 # Configuration
 BACKEND = "http://127.0.0.1:8081"
 PORT = 8080
+WORKERS = os.cpu_count() or 1
+
+# Pre-parse the backend once so each request only needs a string concat
+_backend = urlsplit(BACKEND)
+BACKEND_SCHEME = _backend.scheme
+BACKEND_NETLOC = _backend.netloc
+BACKEND_BASE_PATH = _backend.path.rstrip('/') + '/'
+BACKEND_PREFIX = f"{BACKEND_SCHEME}://{BACKEND_NETLOC}{BACKEND_BASE_PATH}"
+
+# Hop-by-hop headers must not be forwarded; urllib3 owns the connection
+HOP_BY_HOP = frozenset({
+    'connection',
+    'keep-alive',
+    'proxy-authenticate',
+    'proxy-authorization',
+    'te',
+    'trailers',
+    'transfer-encoding',
+    'upgrade',
+})
+
+# Request headers not forwarded to the backend; Host is set from the URL
+REQUEST_SKIP = HOP_BY_HOP | {'host'}
+
+# Size of the chunks relayed from backend to client
+CHUNK_SIZE = 65536
+
+# Responses that never carry a body
+NO_BODY_STATUS = frozenset({204, 304})
+
+# Shared pool manager keeps keep-alive connections to the backend. urllib3 is
+# used directly since a transparent proxy needs none of requests' session,
+# cookie, hook or redirect machinery.
+POOL = urllib3.PoolManager(num_pools=32, maxsize=256, block=False, retries=False)
+
+
+def _send(method, path, headers, body):
+    """Send a request to the backend without reading the response body"""
+    return POOL.urlopen(
+        method,
+        BACKEND_PREFIX + path,
+        headers=headers,
+        body=body,
+        preload_content=False,
+        redirect=False
+    )
+
+
+def _release(resp):
+    """Return the backend connection to the pool once the response is done with"""
+    if not resp.closed:
+        # The client left before the body ended; the unread bytes would be
+        # taken as the next response on this connection, so drop it instead
+        resp.close()
+    resp.release_conn()
+
 
 app = Flask(__name__)
+app.config['MAX_CONTENT_LENGTH'] = None
 
 @app.route('/', defaults={'path': ''}, methods=['GET', 'POST', 'PUT', 'DELETE', 'PATCH'])
 @app.route('/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE', 'PATCH'])
 def proxy(path):
     """Forward all requests to backend"""
-    url = f"{BACKEND}/{path}"
-    
-    # Forward the request
-    resp = requests.request(
-        method=request.method,
-        url=url,
-        headers={k:v for k,v in request.headers if k != 'Host'},
-        data=request.get_data(),
-        cookies=request.cookies,
-        allow_redirects=False
+    if request.query_string:
+        path = f"{path}?{request.query_string.decode('latin-1')}"
+
+    # Only stream a body when the client actually sent one (GET/DELETE usually don't)
+    if request.content_length or 'Transfer-Encoding' in request.headers:
+        body = request.stream
+    else:
+        body = None
+
+    # Forward the request, streaming the body instead of buffering it
+    resp = _send(
+        request.method,
+        path,
+        {k: v for k, v in request.headers.items() if k.lower() not in REQUEST_SKIP},
+        body
     )
-    
-    # Return the response
-    return Response(resp.content, resp.status_code, resp.headers.items())
+
+    # Relay the raw (still encoded) body so Content-Encoding/Length stay valid
+    headers = [(k, v) for k, v in resp.headers.items() if k.lower() not in HOP_BY_HOP]
+    if resp.status in NO_BODY_STATUS or request.method == 'HEAD':
+        # Nothing to relay, but read to the end so the connection is reusable
+        resp.drain_conn()
+        resp.release_conn()
+        # No body given, so Werkzeug doesn't replace the backend's
+        # Content-Length (the entity size for HEAD) with 0
+        response = Response(status=resp.status, headers=headers)
+        response.automatically_set_content_length = False
+        return response
+
+    response = Response(resp.stream(CHUNK_SIZE, decode_content=False), resp.status, headers)
+    # Hand the pooled connection back once the client has the full body
+    response.call_on_close(lambda: _release(resp))
+    return response
 
 if __name__ == '__main__':
     print(f"Flask Proxy Server")
     print(f"Listening on: http://0.0.0.0:{PORT}")
     print(f"Backend: {BACKEND}")
+    print(f"Workers: {WORKERS} (gunicorn + gevent)")
     print("-" * 50)
-    app.run(host='0.0.0.0', port=PORT, debug=False)
\ No newline at end of file
+    # Serve via gunicorn's gevent workers instead of the Werkzeug dev server
+    os.execvp('gunicorn', [
+        'gunicorn',
+        '--chdir', os.path.dirname(os.path.abspath(__file__)),
+        '-w', str(WORKERS),
+        '-k', 'gevent',
+        '--worker-connections', '1000',
+        '--keep-alive', '30',
+        '-b', f'0.0.0.0:{PORT}',
+        'wsgi_proxy:app',
+    ])
@@ -5,14 +5,39 @@ Tests connectivity between sender and receiver across networks
 """
 
 import argparse
+import functools
+import os
+import select
 import socket
+import statistics
+import struct
 import subprocess
 import sys
+import time
 import urllib.request
 import urllib.error
 import json
+from concurrent.futures import ThreadPoolExecutor, wait
 from urllib.parse import urlparse
 
+import dns_cache
+
+try:
+    import orjson
+    _loads = orjson.loads
+    _dumps_pretty = lambda o: orjson.dumps(o, option=orjson.OPT_INDENT_2).decode()
+    _dumps_compact = lambda o: orjson.dumps(o).decode()
+except ImportError:
+    _loads = json.loads
+    _dumps_pretty = lambda o: json.dumps(o, indent=2)
+    _dumps_compact = lambda o: json.dumps(o, separators=(',', ':'))
+
+# Only prettify JSON for a human at a terminal; logs and pipes get it compact
+_dumps = _dumps_pretty if sys.stdout.isatty() else _dumps_compact
+
+# Every probe below resolves the same hostname; look it up once
+dns_cache.install()
+
 
 def print_section(title):
     """Print a formatted section header"""
@@ -21,113 +46,192 @@ def print_section(title):
     print("=" * 70)
 
 
+def print_result(result):
+    """Print the header and collected output lines of a test result"""
+    print(f"\n{result['title']}")
+    for line in result['lines']:
+        print(f"   {line}")
+
+
 def test_dns_resolution(hostname):
     """Test if hostname resolves to an IP address"""
-    print(f"\n🔍 Testing DNS resolution for: {hostname}")
+    result = {'title': f"🔍 Testing DNS resolution for: {hostname}", 'lines': [], 'ok': False, 'ip': None}
     try:
-        ip = socket.gethostbyname(hostname)
-        print(f"   ✅ Resolved to: {ip}")
-        return True, ip
+        ip = socket.getaddrinfo(hostname, None, socket.AF_INET)[0][4][0]
+        result['lines'].append(f"✅ Resolved to: {ip}")
+        result['ok'] = True
+        result['ip'] = ip
     except socket.gaierror as e:
-        print(f"   ❌ Failed to resolve: {e}")
-        return False, None
+        result['lines'].append(f"❌ Failed to resolve: {e}")
+    return result
 
 
 def test_ping(host):
     """Test if host is reachable via ping"""
-    print(f"\n🏓 Testing ping to: {host}")
+    result = {'title': f"🏓 Testing ping to: {host}", 'lines': [], 'ok': False}
     try:
         # Try ping with 3 packets, 2 second timeout
-        result = subprocess.run(
+        proc = subprocess.run(
             ['ping', '-c', '3', '-W', '2', host],
             capture_output=True,
             text=True,
             timeout=10
         )
         
-        if result.returncode == 0:
+        if proc.returncode == 0:
             # Extract average time from ping output
-            for line in result.stdout.split('\n'):
+            for line in proc.stdout.split('\n'):
                 if 'avg' in line or 'time' in line:
-                    print(f"   ✅ Host is reachable")
-                    print(f"   {line.strip()}")
-            return True
+                    result['lines'].append("✅ Host is reachable")
+                    result['lines'].append(line.strip())
+            result['ok'] = True
         else:
-            print(f"   ❌ Ping failed (host may be blocking ICMP)")
-            return False
+            result['lines'].append("❌ Ping failed (host may be blocking ICMP)")
     except subprocess.TimeoutExpired:
-        print(f"   ❌ Ping timeout")
-        return False
+        result['lines'].append("❌ Ping timeout")
     except FileNotFoundError:
-        print(f"   ⚠️  Ping command not found, skipping")
-        return None
+        result['lines'].append("⚠️  Ping command not found, skipping")
+        result['ok'] = None
+    return result
+
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+_ICMP_HEADER = struct.Struct('!BBHHH')
+_ICMP_PAYLOAD = b'webrtc-diagnostic'
 
 
-def test_port_open(host, port):
-    """Test if a specific port is open"""
-    print(f"\n🔌 Testing port {port} on {host}")
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.settimeout(5)
+def _icmp_checksum(data):
+    """RFC 1071 internet checksum"""
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _icmp_echo_packet(ident, seq):
+    """Build an RFC 792 Echo Request"""
+    header = _ICMP_HEADER.pack(ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    checksum = _icmp_checksum(header + _ICMP_PAYLOAD)
+    return _ICMP_HEADER.pack(ICMP_ECHO_REQUEST, 0, checksum, ident, seq) + _ICMP_PAYLOAD
+
+
+def test_icmp_ping(host, n=3, timeout=2):
+    """Test if host answers ICMP echo using a raw socket (needs CAP_NET_RAW)"""
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+    except PermissionError:
+        # Fall back to the system ping binary, which is setuid/capable
+        return test_ping(host)
     
+    result = {'title': f"🏓 Testing ICMP ping to: {host}", 'lines': [], 'ok': False}
+    ident = os.getpid() & 0xFFFF
+    samples = []
     try:
-        result = sock.connect_ex((host, port))
-        if result == 0:
-            print(f"   ✅ Port {port} is OPEN")
-            return True
+        addr = socket.getaddrinfo(host, None, socket.AF_INET)[0][4][0]
+        for seq in range(n):
+            start = time.perf_counter()
+            sock.sendto(_icmp_echo_packet(ident, seq), (addr, 0))
+            deadline = start + timeout
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 or not select.select([sock], [], [], remaining)[0]:
+                    break
+                packet, _ = sock.recvfrom(1024)
+                # Skip the IP header (IHL is in 32-bit words)
+                offset = (packet[0] & 0x0F) * 4
+                icmp_type, _, _, reply_id, reply_seq = _ICMP_HEADER.unpack_from(packet, offset)
+                if icmp_type == ICMP_ECHO_REPLY and reply_id == ident and reply_seq == seq:
+                    samples.append((time.perf_counter() - start) * 1000)
+                    break
+    except OSError as e:
+        result['lines'].append(f"❌ ICMP error: {e}")
+        return result
+    finally:
+        sock.close()
+    
+    if samples:
+        result['lines'].append(f"✅ Host is reachable ({len(samples)}/{n} replies)")
+        result['lines'].append(f"rtt min/avg/max = {min(samples):.2f}/{statistics.mean(samples):.2f}/{max(samples):.2f} ms")
+        result['ok'] = True
+    else:
+        result['lines'].append("❌ Ping failed (host may be blocking ICMP)")
+    return result
+
+
+def test_port_open(host, port, n=3):
+    """Test if a specific port is open, timing the TCP connects as the RTT"""
+    result = {'title': f"🔌 Testing port {port} on {host}", 'lines': [], 'ok': False}
+    samples = []
+    
+    try:
+        addr = socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_STREAM)[0][4]
+        for _ in range(n):
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                sock.settimeout(5)
+                start = time.perf_counter()
+                if sock.connect_ex(addr) != 0:
+                    break
+                samples.append((time.perf_counter() - start) * 1000)
+        if samples:
+            stdev = statistics.stdev(samples) if len(samples) > 1 else 0.0
+            result['lines'].append(f"✅ Port {port} is OPEN "
+                                   f"(connect rtt mean/stdev = {statistics.mean(samples):.2f}/{stdev:.2f} ms)")
+            result['ok'] = True
         else:
-            print(f"   ❌ Port {port} is CLOSED or FILTERED")
-            return False
+            result['lines'].append(f"❌ Port {port} is CLOSED or FILTERED")
     except socket.gaierror:
-        print(f"   ❌ Could not resolve hostname")
-        return False
+        result['lines'].append("❌ Could not resolve hostname")
     except Exception as e:
-        print(f"   ❌ Error testing port: {e}")
-        return False
-    finally:
-        sock.close()
+        result['lines'].append(f"❌ Error testing port: {e}")
+    return result
 
 
 def test_http_endpoint(url, endpoint="/health"):
     """Test if HTTP endpoint is accessible"""
     full_url = url.rstrip('/') + endpoint
-    print(f"\n🌐 Testing HTTP endpoint: {full_url}")
+    result = {'title': f"🌐 Testing HTTP endpoint: {full_url}", 'lines': [], 'ok': False}
     
     try:
         req = urllib.request.Request(full_url, method='GET')
         with urllib.request.urlopen(req, timeout=10) as response:
             if response.status == 200:
-                body = response.read().decode('utf-8')
-                print(f"   ✅ Endpoint is accessible (HTTP {response.status})")
+                body = response.read()
+                result['lines'].append(f"✅ Endpoint is accessible (HTTP {response.status})")
                 try:
-                    data = json.loads(body)
-                    print(f"   📊 Response: {json.dumps(data, indent=6)}")
-                except:
-                    print(f"   📄 Response: {body[:200]}")
-                return True
+                    data = _loads(body)
+                    result['lines'].append(f"📊 Response: {_dumps(data)}")
+                except ValueError:
+                    result['lines'].append(f"📄 Response: {body[:200].decode('utf-8', 'replace')}")
+                result['ok'] = True
             else:
-                print(f"   ⚠️  Got HTTP {response.status}")
-                return False
+                result['lines'].append(f"⚠️  Got HTTP {response.status}")
     except urllib.error.HTTPError as e:
-        print(f"   ❌ HTTP Error {e.code}: {e.reason}")
-        return False
+        result['lines'].append(f"❌ HTTP Error {e.code}: {e.reason}")
     except urllib.error.URLError as e:
-        print(f"   ❌ Connection failed: {e.reason}")
-        return False
+        result['lines'].append(f"❌ Connection failed: {e.reason}")
     except Exception as e:
-        print(f"   ❌ Error: {e}")
-        return False
+        result['lines'].append(f"❌ Error: {e}")
+    return result
+
 
+@functools.lru_cache(maxsize=32)
+def _route_source_ip(dest):
+    """Local IP the kernel would route to dest from; raises OSError, so failures aren't cached"""
+    # Connecting a UDP socket only picks a route; no packet is sent
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.setblocking(False)
+        s.connect((dest, 80))
+        return s.getsockname()[0]
 
-def get_local_ip():
-    """Get local IP address"""
+
+def get_local_ip(dest="8.8.8.8"):
+    """Get the local IP address used to reach dest (cached per dest on success)"""
     try:
-        # Create a socket to determine the local IP
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        s.connect(("8.8.8.8", 80))
-        local_ip = s.getsockname()[0]
-        s.close()
-        return local_ip
-    except:
+        return _route_source_ip(dest)
+    except OSError:
         return "Unknown"
 
 
@@ -169,6 +273,13 @@ def main():
         action="store_true",
         help="Skip ping test (useful if ICMP is blocked)"
     )
+    parser.add_argument(
+        "--icmp",
+        action="store_true",
+        help="Also ping with ICMP echo; by default the RTT comes from the port "
+             "check's TCP connects (raw socket needs CAP_NET_RAW, otherwise "
+             "uses the ping command)"
+    )
     
     args = parser.parse_args()
     
@@ -188,23 +299,37 @@ def main():
     # Run tests
     print_section("Running Connectivity Tests")
     
-    results = {}
-    
-    # Test 1: DNS Resolution
-    results['dns'], resolved_ip = test_dns_resolution(sender_host)
+    # Tests 1-4 are independent, so run them concurrently and report
+    # in a fixed order once all have finished
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = {
+            'dns': executor.submit(test_dns_resolution, sender_host),
+            'port': executor.submit(test_port_open, sender_host, sender_port),
+            'http': executor.submit(test_http_endpoint, args.sender_url),
+        }
+        if args.icmp and not args.skip_ping:
+            futures['ping'] = executor.submit(test_icmp_ping, sender_host)
+        wait(futures.values())
     
-    # Test 2: Ping (optional)
-    if not args.skip_ping:
-        results['ping'] = test_ping(sender_host)
-    else:
-        print("\n🏓 Ping test skipped")
-        results['ping'] = None
-    
-    # Test 3: Port connectivity
-    results['port'] = test_port_open(sender_host, sender_port)
+    outcomes = {name: future.result() for name, future in futures.items()}
+    resolved_ip = outcomes['dns']['ip']
     
-    # Test 4: HTTP endpoint
-    results['http'] = test_http_endpoint(args.sender_url)
+    results = {}
+    for name in ('dns', 'ping', 'port', 'http'):
+        if name == 'ping' and 'ping' not in outcomes:
+            if args.skip_ping:
+                print("\n🏓 Ping test skipped")
+            else:
+                print("\n🏓 Ping: RTT is reported by the port check (use --icmp for ICMP echo)")
+            results['ping'] = None
+            continue
+        if name != 'dns' and not results['dns']:
+            # Everything else depends on the hostname resolving
+            print(f"\n⏭️  {name.upper()} test skipped (DNS resolution failed)")
+            results[name] = None
+            continue
+        print_result(outcomes[name])
+        results[name] = outcomes[name]['ok']
     
     # Test 5: Firewall check
     test_firewall_ports()
@@ -233,7 +358,7 @@ def main():
             print("      - This is common and may not be a problem")
             print("      - Continue testing other connections")
         
-        if not results['port']:
+        if results['port'] is False:
             print(f"\n   3. Port {sender_port} is Not Reachable:")
             print("      - Sender firewall may be blocking the port")
             print("      - Sender commands to allow port:")
@@ -242,7 +367,7 @@ def main():
             print("      - Network firewall/router may be blocking")
             print("      - Check if sender is actually running")
         
-        if not results['http']:
+        if results['http'] is False:
             print("\n   4. HTTP Endpoint Not Accessible:")
             print("      - Make sure sender is running:")
             print(f"        python3 sender.py --host 0.0.0.0 --port {sender_port}")
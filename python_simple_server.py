@@ -1,14 +1,27 @@
-from flask import Flask, request, jsonify
-from datetime import datetime
+import os
+from collections import deque
+from flask import Flask, Response, request
+from datetime import datetime, timezone
+import orjson
 
 app = Flask(__name__)
 
-# In-memory storage for data
-data_store = []
+# In-memory storage for data, bounded so sustained traffic can't exhaust memory
+DATA_STORE_SIZE = 10000
+data_store = deque(maxlen=DATA_STORE_SIZE)
 
-@app.route('/')
-def home():
-    return '''
+# Serialized GET /data body, reused until data_store changes
+data_version = 0
+data_cache = (-1, b'')
+
+
+def json_response(payload, status=200):
+    """Serialize payload with orjson (datetimes are emitted as RFC 3339)"""
+    return Response(orjson.dumps(payload), status=status, mimetype='application/json')
+
+
+# Static home page, encoded once
+HOME_HTML = '''
     <h1>Simple Python Web Server</h1>
     <p>Available endpoints:</p>
     <ul>
@@ -17,46 +30,81 @@ def home():
         <li>POST /data - Send data (JSON body: {"message": "your message"})</li>
         <li>GET /health - Health check</li>
     </ul>
-    '''
+    '''.encode('utf-8')
+
+@app.after_request
+def cache_home(response):
+    if request.path == '/':
+        response.headers['Cache-Control'] = 'public, max-age=3600'
+    return response
+
+@app.route('/', methods=['GET'])
+def home():
+    return Response(HOME_HTML, mimetype='text/html')
 
 @app.route('/health')
 def health():
-    return jsonify({
+    return json_response({
         'status': 'healthy',
-        'timestamp': datetime.now().isoformat()
+        'timestamp': datetime.now(timezone.utc)
     })
 
 @app.route('/data', methods=['GET'])
 def get_data():
-    return jsonify({
-        'count': len(data_store),
-        'data': data_store
-    })
+    global data_cache
+    version, body = data_cache
+    if version != data_version:
+        body = orjson.dumps({
+            'count': len(data_store),
+            'data': list(data_store)
+        })
+        data_cache = (data_version, body)
+    return Response(body, mimetype='application/json')
 
 @app.route('/data', methods=['POST'])
 def post_data():
+    global data_version
     try:
         content = request.get_json()
         
         if not content:
-            return jsonify({'error': 'No JSON data provided'}), 400
+            return json_response({'error': 'No JSON data provided'}, 400)
         
         # Add timestamp to the data
         entry = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': datetime.now(timezone.utc),
             'data': content
         }
         
+        # Only store what GET /data can encode (e.g. orjson rejects integers
+        # beyond 64 bits); a bad entry would break every later GET
+        try:
+            body = orjson.dumps({
+                'message': 'Data received successfully',
+                'entry': entry
+            })
+        except TypeError as e:
+            return json_response({'error': f'Unsupported JSON value: {e}'}, 400)
+        
         data_store.append(entry)
+        data_version += 1
         
-        return jsonify({
-            'message': 'Data received successfully',
-            'entry': entry
-        }), 201
+        return Response(body, status=201, mimetype='application/json')
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
 if __name__ == '__main__':
     print("Starting server on http://0.0.0.0:5000")
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # Serve via gunicorn's gevent workers instead of the Werkzeug dev server.
+    # A single worker, since data_store lives in process memory.
+    os.execvp('gunicorn', [
+        'gunicorn',
+        '--chdir', os.path.dirname(os.path.abspath(__file__)),
+        '-w', '1',
+        '-k', 'gevent',
+        '--worker-connections', '1000',
+        '--keep-alive', '30',
+        '-b', '0.0.0.0:5000',
+        'wsgi_simple:app',
+    ])
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Tests for flask_proxy
+Usage: python3 -m unittest discover tests
+"""
+
+import io
+import unittest
+from unittest import mock
+
+import urllib3
+
+import flask_proxy
+
+
+def _backend_response(status=200, headers=None, body=b''):
+    """An unread backend response, as _send returns it"""
+    return urllib3.HTTPResponse(
+        body=io.BytesIO(body),
+        headers=headers or {},
+        status=status,
+        preload_content=False
+    )
+
+
+class ProxyHeadTest(unittest.TestCase):
+    def setUp(self):
+        self.client = flask_proxy.app.test_client()
+
+    def test_head_keeps_backend_content_length(self):
+        backend = _backend_response(headers={'Content-Length': '1234', 'Content-Type': 'text/plain'})
+        with mock.patch.object(flask_proxy, '_send', return_value=backend) as send:
+            response = self.client.head('/video/stream')
+
+        self.assertEqual(send.call_args[0][0], 'HEAD')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Length'], '1234')
+        self.assertEqual(response.headers['Content-Type'], 'text/plain')
+        self.assertEqual(response.data, b'')
+
+    def test_not_modified_keeps_backend_headers(self):
+        backend = _backend_response(status=304, headers={'ETag': '"abc"'})
+        with mock.patch.object(flask_proxy, '_send', return_value=backend):
+            response = self.client.get('/index.html', headers={'If-None-Match': '"abc"'})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], '"abc"')
+        self.assertEqual(response.data, b'')
+
+
+if __name__ == '__main__':
+    unittest.main()
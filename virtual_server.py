@@ -1,223 +1,36 @@
 #!/usr/bin/env python3
 
 import asyncio
+import gzip
+import hashlib
 import json
 import logging
+import orjson
 import argparse
+import multiprocessing
+import os
+import random
+import aiohttp
 from aiohttp import web
 from aiortc import RTCPeerConnection, RTCSessionDescription, RTCConfiguration, RTCIceServer, MediaStreamTrack
-from av import VideoFrame
-import numpy as np
-import cv2
-import time
-import fractions
+from aiortc.mediastreams import MediaStreamError
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Ping messages as serialized by json.dumps and by compact encoders (orjson, JS)
+_PING_PREFIXES = ('{"type": "ping"', '{"type":"ping"')
 
-class VideoRelayTrack(MediaStreamTrack):
-    """
-    Video track that relays frames from upstream source
-    """
-    kind = "video"
-    
-    def __init__(self, track):
-        super().__init__()
-        self.track = track
-        self._start = None
-        self.frame_count = 0
-    
-    async def recv(self):
-        """Relay video frames"""
-        frame = await self.track.recv()
-        self.frame_count += 1
-        
-        if self.frame_count % 100 == 0:
-            logger.info(f"Relayed {self.frame_count} frames")
-        
-        return frame
+# Upper bound in seconds for the upstream reconnect backoff
+RECONNECT_MAX_BACKOFF = 60.0
 
+# Seconds to wait for peer connections to close on shutdown
+SHUTDOWN_TIMEOUT = 5.0
 
-class WebRTCRelay:
-    """
-    WebRTC Relay Server that receives stream from one source 
-    and distributes to multiple clients
-    """
-    
-    def __init__(self, upstream_url="http://localhost:8081"):
-        self.upstream_url = upstream_url
-        self.upstream_pc = None
-        self.upstream_track = None
-        self.client_pcs = set()
-        self.connected = False
-        self.reconnect_task = None
-        
-    async def connect_to_upstream(self):
-        """Connect to upstream WebRTC server (camera source)"""
-        try:
-            logger.info(f"Connecting to upstream server: {self.upstream_url}")
-            
-            # Configure peer connection
-            config = RTCConfiguration(
-                iceServers=[
-                    RTCIceServer(urls=["stun:stun.l.google.com:19302"]),
-                    RTCIceServer(urls=["stun:stun1.l.google.com:19302"])
-                ]
-            )
-            
-            self.upstream_pc = RTCPeerConnection(configuration=config)
-            
-            # Handle incoming track
-            @self.upstream_pc.on("track")
-            async def on_track(track):
-                logger.info(f"Received {track.kind} track from upstream")
-                if track.kind == "video":
-                    self.upstream_track = track
-                    self.connected = True
-                    logger.info("✓ Upstream video track ready for relay")
-            
-            @self.upstream_pc.on("connectionstatechange")
-            async def on_connectionstatechange():
-                logger.info(f"Upstream connection state: {self.upstream_pc.connectionState}")
-                if self.upstream_pc.connectionState == "failed":
-                    logger.error("Upstream connection failed!")
-                    self.connected = False
-                    # Schedule reconnection
-                    if not self.reconnect_task or self.reconnect_task.done():
-                        self.reconnect_task = asyncio.create_task(self.reconnect_upstream())
-                elif self.upstream_pc.connectionState == "closed":
-                    logger.warning("Upstream connection closed")
-                    self.connected = False
-                elif self.upstream_pc.connectionState == "connected":
-                    logger.info("✓ Connected to upstream server!")
-                    self.connected = True
-            
-            # Create data channel
-            dc = self.upstream_pc.createDataChannel("chat")
-            
-            @dc.on("open")
-            def on_open():
-                logger.info("Upstream data channel opened")
-            
-            # Create offer
-            offer = await self.upstream_pc.createOffer()
-            await self.upstream_pc.setLocalDescription(offer)
-            
-            # Send offer to upstream server
-            import aiohttp
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.upstream_url}/offer",
-                    json={
-                        "sdp": self.upstream_pc.localDescription.sdp,
-                        "type": self.upstream_pc.localDescription.type
-                    },
-                    headers={"Content-Type": "application/json"}
-                ) as response:
-                    if response.status == 200:
-                        answer = await response.json()
-                        await self.upstream_pc.setRemoteDescription(
-                            RTCSessionDescription(
-                                sdp=answer["sdp"],
-                                type=answer["type"]
-                            )
-                        )
-                        logger.info("Upstream connection setup complete")
-                        return True
-                    else:
-                        logger.error(f"Failed to connect to upstream: {response.status}")
-                        return False
-                        
-        except Exception as e:
-            logger.error(f"Error connecting to upstream: {e}")
-            return False
-    
-    async def reconnect_upstream(self):
-        """Attempt to reconnect to upstream server"""
-        logger.info("Attempting to reconnect to upstream...")
-        await asyncio.sleep(5)  # Wait before reconnecting
-        await self.connect_to_upstream()
-    
-    async def handle_client_offer(self, request):
-        """Handle WebRTC offer from client"""
-        params = await request.json()
-        offer = RTCSessionDescription(sdp=params["sdp"], type=params["type"])
-        
-        # Check if upstream is connected
-        if not self.connected or not self.upstream_track:
-            logger.warning("Upstream not connected, cannot serve client")
-            return web.Response(
-                status=503,
-                text="Upstream server not connected"
-            )
-        
-        # Configure client peer connection
-        config = RTCConfiguration(
-            iceServers=[
-                RTCIceServer(urls=["stun:stun.l.google.com:19302"]),
-                RTCIceServer(urls=["stun:stun1.l.google.com:19302"])
-            ]
-        )
-        
-        pc = RTCPeerConnection(configuration=config)
-        self.client_pcs.add(pc)
-        
-        client_id = len(self.client_pcs)
-        logger.info(f"New client connection #{client_id}")
-        
-        @pc.on("connectionstatechange")
-        async def on_connectionstatechange():
-            logger.info(f"Client #{client_id} state: {pc.connectionState}")
-            if pc.connectionState == "failed":
-                logger.error(f"Client #{client_id} connection failed")
-                await pc.close()
-                self.client_pcs.discard(pc)
-            elif pc.connectionState == "closed":
-                logger.info(f"Client #{client_id} disconnected")
-                self.client_pcs.discard(pc)
-            elif pc.connectionState == "connected":
-                logger.info(f"✓ Client #{client_id} connected!")
-        
-        @pc.on("datachannel")
-        def on_datachannel(channel):
-            logger.info(f"Client #{client_id} data channel: {channel.label}")
-            
-            @channel.on("message")
-            def on_message(message):
-                try:
-                    data = json.loads(message)
-                    if data.get("type") == "ping":
-                        pong = json.dumps({
-                            "type": "pong",
-                            "timestamp": data["timestamp"]
-                        })
-                        channel.send(pong)
-                except:
-                    pass
-        
-        # Add relayed video track to client
-        relay_track = VideoRelayTrack(self.upstream_track)
-        pc.addTrack(relay_track)
-        
-        await pc.setRemoteDescription(offer)
-        answer = await pc.createAnswer()
-        await pc.setLocalDescription(answer)
-        
-        logger.info(f"Sending answer to client #{client_id}")
-        
-        return web.Response(
-            content_type="application/json",
-            text=json.dumps({
-                "sdp": pc.localDescription.sdp,
-                "type": pc.localDescription.type
-            })
-        )
-    
-    async def serve_index(self, request):
-        """Serve simple test HTML page"""
-        html = """
+
+# Test page served at "/", encoded and compressed once at import
+INDEX_HTML = """
 <!DOCTYPE html>
 <html>
 <head>
@@ -399,8 +212,297 @@ class WebRTCRelay:
     </script>
 </body>
 </html>
+"""
+_INDEX_BYTES = INDEX_HTML.encode("utf-8")
+_INDEX_GZ = gzip.compress(_INDEX_BYTES, 9)
+_INDEX_ETAG = '"' + hashlib.md5(_INDEX_BYTES).hexdigest() + '"'
+
+
+class VideoRelayTrack(MediaStreamTrack):
+    """
+    Video track that relays frames fanned out from the upstream source
+    """
+    kind = "video"
+    
+    def __init__(self, queue):
+        super().__init__()
+        self._queue = queue
+        self._start = None
+        self.frame_count = 0
+    
+    async def recv(self):
+        """Relay video frames"""
+        if self.readyState != "live":
+            raise MediaStreamError
+        frame = await self._queue.get()
+        if frame is None:
+            # Upstream ended: end this track instead of waiting forever
+            self.stop()
+            raise MediaStreamError
+        self.frame_count += 1
+        
+        if self.frame_count % 100 == 0:
+            logger.info(f"Relayed {self.frame_count} frames")
+        
+        return frame
+
+
+class WebRTCRelay:
+    """
+    WebRTC Relay Server that receives stream from one source 
+    and distributes to multiple clients
+    """
+    
+    def __init__(self, upstream_url="http://localhost:8081"):
+        self.upstream_url = upstream_url
+        self.upstream_pc = None
+        self.upstream_track = None
+        self.client_pcs = set()
+        self.connected = False
+        self.reconnect_task = None
+        self._backoff = 1.0
+        self._subscribers = set()
+        self._fanout_task = None
+        # Signaling session reused across reconnects (keeps pool and DNS cache)
+        self._http = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(ttl_dns_cache=300, keepalive_timeout=60)
+        )
+    
+    def subscribe(self):
+        """Register a client and return the queue its relay track reads from"""
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers.add(queue)
+        return queue
+    
+    def unsubscribe(self, queue):
+        """Stop delivering frames to a client queue"""
+        self._subscribers.discard(queue)
+    
+    def _start_fanout(self):
+        """(Re)start the single consumer of the current upstream track"""
+        if self._fanout_task and not self._fanout_task.done():
+            self._fanout_task.cancel()
+        self._fanout_task = asyncio.create_task(self._fanout(self.upstream_track))
+    
+    async def _fanout(self, track):
+        """
+        Receive each upstream frame once and hand it to every subscriber.
+        Queues hold a single frame and drop the oldest, so a slow client
+        never holds back the others. When the upstream track ends, every
+        subscriber gets a None end marker.
+        """
+        try:
+            while True:
+                frame = await track.recv()
+                for queue in self._subscribers:
+                    if queue.full():
+                        queue.get_nowait()
+                    queue.put_nowait(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Upstream track stopped: {e}")
+        
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(None)
+        self._subscribers.clear()
+        
+    async def connect_to_upstream(self):
+        """Connect to upstream WebRTC server (camera source)"""
+        try:
+            logger.info(f"Connecting to upstream server: {self.upstream_url}")
+            
+            # Configure peer connection
+            config = RTCConfiguration(
+                iceServers=[
+                    RTCIceServer(urls=["stun:stun.l.google.com:19302"]),
+                    RTCIceServer(urls=["stun:stun1.l.google.com:19302"])
+                ]
+            )
+            
+            self.upstream_pc = RTCPeerConnection(configuration=config)
+            
+            # Handle incoming track
+            @self.upstream_pc.on("track")
+            async def on_track(track):
+                logger.info(f"Received {track.kind} track from upstream")
+                if track.kind == "video":
+                    self.upstream_track = track
+                    self.connected = True
+                    self._start_fanout()
+                    logger.info("✓ Upstream video track ready for relay")
+            
+            @self.upstream_pc.on("connectionstatechange")
+            async def on_connectionstatechange():
+                logger.info(f"Upstream connection state: {self.upstream_pc.connectionState}")
+                if self.upstream_pc.connectionState == "failed":
+                    logger.error("Upstream connection failed!")
+                    self.connected = False
+                    # Schedule reconnection
+                    if not self.reconnect_task or self.reconnect_task.done():
+                        self.reconnect_task = asyncio.create_task(self.reconnect_upstream())
+                elif self.upstream_pc.connectionState == "closed":
+                    logger.warning("Upstream connection closed")
+                    self.connected = False
+                elif self.upstream_pc.connectionState == "connected":
+                    logger.info("✓ Connected to upstream server!")
+                    self.connected = True
+                    self._backoff = 1.0
+            
+            # Create data channel
+            dc = self.upstream_pc.createDataChannel("chat")
+            
+            @dc.on("open")
+            def on_open():
+                logger.info("Upstream data channel opened")
+            
+            # Create offer
+            offer = await self.upstream_pc.createOffer()
+            await self.upstream_pc.setLocalDescription(offer)
+            
+            # Send offer to upstream server
+            async with self._http.post(
+                f"{self.upstream_url}/offer",
+                json={
+                    "sdp": self.upstream_pc.localDescription.sdp,
+                    "type": self.upstream_pc.localDescription.type
+                },
+                headers={"Content-Type": "application/json"}
+            ) as response:
+                if response.status == 200:
+                    answer = await response.json()
+                    await self.upstream_pc.setRemoteDescription(
+                        RTCSessionDescription(
+                            sdp=answer["sdp"],
+                            type=answer["type"]
+                        )
+                    )
+                    logger.info("Upstream connection setup complete")
+                    return True
+                else:
+                    logger.error(f"Failed to connect to upstream: {response.status}")
+                    return False
+                        
+        except Exception as e:
+            logger.error(f"Error connecting to upstream: {e}")
+            return False
+    
+    async def reconnect_upstream(self):
         """
-        return web.Response(content_type="text/html", text=html)
+        Reconnect to upstream server using exponential backoff with full jitter,
+        so retries back off during outages and relays don't retry in lockstep
+        """
+        while True:
+            delay = random.uniform(0, min(self._backoff, RECONNECT_MAX_BACKOFF))
+            logger.info(f"Attempting to reconnect to upstream in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+            if await self.connect_to_upstream():
+                return
+            self._backoff = min(self._backoff * 2, RECONNECT_MAX_BACKOFF)
+    
+    async def handle_client_offer(self, request):
+        """Handle WebRTC offer from client"""
+        params = await request.json()
+        offer = RTCSessionDescription(sdp=params["sdp"], type=params["type"])
+        
+        # Check if upstream is connected
+        if not self.connected or not self.upstream_track:
+            logger.warning("Upstream not connected, cannot serve client")
+            return web.Response(
+                status=503,
+                text="Upstream server not connected"
+            )
+        
+        # Configure client peer connection
+        config = RTCConfiguration(
+            iceServers=[
+                RTCIceServer(urls=["stun:stun.l.google.com:19302"]),
+                RTCIceServer(urls=["stun:stun1.l.google.com:19302"])
+            ]
+        )
+        
+        pc = RTCPeerConnection(configuration=config)
+        self.client_pcs.add(pc)
+        
+        client_id = len(self.client_pcs)
+        logger.info(f"New client connection #{client_id}")
+        queue = self.subscribe()
+        
+        @pc.on("connectionstatechange")
+        async def on_connectionstatechange():
+            logger.info(f"Client #{client_id} state: {pc.connectionState}")
+            if pc.connectionState == "failed":
+                logger.error(f"Client #{client_id} connection failed")
+                self.unsubscribe(queue)
+                await pc.close()
+                self.client_pcs.discard(pc)
+            elif pc.connectionState == "closed":
+                logger.info(f"Client #{client_id} disconnected")
+                self.unsubscribe(queue)
+                self.client_pcs.discard(pc)
+            elif pc.connectionState == "connected":
+                logger.info(f"✓ Client #{client_id} connected!")
+        
+        @pc.on("datachannel")
+        def on_datachannel(channel):
+            logger.info(f"Client #{client_id} data channel: {channel.label}")
+            
+            @channel.on("message")
+            def on_message(message):
+                # Fast path: echo pings back as pongs without parsing them
+                if isinstance(message, str) and message.startswith(_PING_PREFIXES):
+                    channel.send(message.replace('"ping"', '"pong"', 1))
+                    return
+                try:
+                    data = orjson.loads(message)
+                    if data.get("type") == "ping":
+                        channel.send(orjson.dumps({
+                            "type": "pong",
+                            "timestamp": data["timestamp"]
+                        }).decode())
+                except (orjson.JSONDecodeError, AttributeError, KeyError):
+                    pass
+        
+        # Add relayed video track to client
+        relay_track = VideoRelayTrack(queue)
+        pc.addTrack(relay_track)
+        
+        try:
+            await pc.setRemoteDescription(offer)
+            answer = await pc.createAnswer()
+            await pc.setLocalDescription(answer)
+        except Exception as e:
+            # Malformed offer: don't leave the queue subscribed or the pc open
+            logger.warning(f"Client #{client_id} negotiation failed: {e}")
+            self.unsubscribe(queue)
+            await pc.close()
+            self.client_pcs.discard(pc)
+            return web.Response(status=400, text=f"Invalid offer: {e}")
+        
+        logger.info(f"Sending answer to client #{client_id}")
+        
+        return web.Response(
+            content_type="application/json",
+            text=json.dumps({
+                "sdp": pc.localDescription.sdp,
+                "type": pc.localDescription.type
+            })
+        )
+    
+    async def serve_index(self, request):
+        """Serve simple test HTML page (precompressed, cached by ETag)"""
+        if request.headers.get("If-None-Match") == _INDEX_ETAG:
+            return web.Response(status=304, headers={"ETag": _INDEX_ETAG})
+        
+        headers = {"ETag": _INDEX_ETAG, "Cache-Control": "public, max-age=3600", "Vary": "Accept-Encoding"}
+        if "gzip" in request.headers.get("Accept-Encoding", ""):
+            headers["Content-Encoding"] = "gzip"
+            body = _INDEX_GZ
+        else:
+            body = _INDEX_BYTES
+        return web.Response(body=body, headers=headers, content_type="text/html", charset="utf-8")
     
     async def status_endpoint(self, request):
         """Status endpoint for monitoring"""
@@ -418,19 +520,71 @@ class WebRTCRelay:
         """Cleanup on shutdown"""
         logger.info("Shutting down relay server...")
         
-        # Close all client connections
+        if self._fanout_task:
+            self._fanout_task.cancel()
+        self._subscribers.clear()
+        
+        # Close client and upstream connections together, bounded in time
         coros = [pc.close() for pc in self.client_pcs]
-        await asyncio.gather(*coros)
+        if self.upstream_pc:
+            coros.append(self.upstream_pc.close())
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*coros, return_exceptions=True),
+                timeout=SHUTDOWN_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Connections did not close within {SHUTDOWN_TIMEOUT}s, giving up")
         self.client_pcs.clear()
+        self.upstream_pc = None
         
-        # Close upstream connection
-        if self.upstream_pc:
-            await self.upstream_pc.close()
+        await self._http.close()
         
         logger.info("Shutdown complete")
 
 
-async def main():
+async def run_worker(upstream, host, port, reuse_port=False):
+    """Run one relay process: upstream connection plus web server"""
+    # Create relay instance
+    relay = WebRTCRelay(upstream_url=upstream)
+    
+    # Connect to upstream
+    await relay.connect_to_upstream()
+    
+    # Setup web application
+    app = web.Application()
+    app.on_shutdown.append(relay.on_shutdown)
+    app.router.add_get("/", relay.serve_index)
+    app.router.add_post("/offer", relay.handle_client_offer)
+    app.router.add_get("/status", relay.status_endpoint)
+    
+    # Run web server
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port, reuse_port=reuse_port)
+    await site.start()
+    
+    logger.info(f"✓ Relay server started successfully (pid {os.getpid()})")
+    logger.info("Press Ctrl+C to stop")
+    
+    try:
+        # Keep running
+        await asyncio.Event().wait()
+    except KeyboardInterrupt:
+        logger.info("Interrupted by user")
+    finally:
+        await runner.cleanup()
+
+
+def _worker_entry(upstream, host, port, reuse_port):
+    """Process target for additional workers"""
+    try:
+        asyncio.run(run_worker(upstream, host, port, reuse_port))
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
     parser = argparse.ArgumentParser(description="WebRTC Relay Server")
     parser.add_argument(
         "--upstream",
@@ -448,46 +602,48 @@ async def main():
         default=8081,
         help="Port to bind to (default: 8081)"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes sharing the port via SO_REUSEPORT; each keeps "
+             "its own upstream connection (default: 1, 0 = one per CPU)"
+    )
     args = parser.parse_args()
     
+    workers = args.workers or os.cpu_count() or 1
+    
     logger.info("=" * 60)
     logger.info("WebRTC Relay Server")
     logger.info("=" * 60)
     logger.info(f"Upstream source: {args.upstream}")
     logger.info(f"Listening on: {args.host}:{args.port}")
     logger.info(f"Web interface: http://{args.host}:{args.port}")
+    logger.info(f"Workers: {workers}")
     logger.info("=" * 60)
     
-    # Create relay instance
-    relay = WebRTCRelay(upstream_url=args.upstream)
-    
-    # Connect to upstream
-    await relay.connect_to_upstream()
-    
-    # Setup web application
-    app = web.Application()
-    app.on_shutdown.append(relay.on_shutdown)
-    app.router.add_get("/", relay.serve_index)
-    app.router.add_post("/offer", relay.handle_client_offer)
-    app.router.add_get("/status", relay.status_endpoint)
-    
-    # Run web server
-    runner = web.AppRunner(app)
-    await runner.setup()
-    site = web.TCPSite(runner, args.host, args.port)
-    await site.start()
-    
-    logger.info("✓ Relay server started successfully")
-    logger.info("Press Ctrl+C to stop")
+    # The kernel balances incoming connections across the listening sockets
+    reuse_port = workers > 1
+    processes = [
+        multiprocessing.Process(
+            target=_worker_entry,
+            args=(args.upstream, args.host, args.port, reuse_port),
+            daemon=True
+        )
+        for _ in range(workers - 1)
+    ]
+    for process in processes:
+        process.start()
     
     try:
-        # Keep running
-        await asyncio.Event().wait()
+        asyncio.run(run_worker(args.upstream, args.host, args.port, reuse_port))
     except KeyboardInterrupt:
-        logger.info("Interrupted by user")
+        pass
     finally:
-        await runner.cleanup()
+        for process in processes:
+            process.terminate()
+            process.join()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    main()
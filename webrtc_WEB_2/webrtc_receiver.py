@@ -6,12 +6,28 @@ Connects to remote sender, receives video stream, and serves web interface for v
 
 import argparse
 import asyncio
+import gzip
+import hashlib
 import json
 import logging
 import os
 from aiohttp import web
 import aiohttp
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj):
+        return json.dumps(obj).encode("utf-8")
+    _loads = json.loads
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -20,73 +36,8 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-class WebRTCReceiver:
-    """
-    WebRTC receiver that manages connection to sender and serves web interface.
-    Acts as a proxy between web clients and the WebRTC sender.
-    """
-    
-    def __init__(self, sender_url):
-        """
-        Initialize the receiver.
-        
-        Args:
-            sender_url: URL of the WebRTC sender (e.g., http://192.168.1.100:8080)
-        """
-        self.sender_url = sender_url.rstrip('/')
-        self.offer_endpoint = f"{self.sender_url}/offer"
-        logger.info(f"Receiver configured for sender: {self.sender_url}")
-    
-    async def forward_offer(self, offer_data):
-        """
-        Forward WebRTC offer to sender and return answer.
-        
-        Args:
-            offer_data: Dictionary containing SDP offer
-            
-        Returns:
-            Dictionary containing SDP answer
-            
-        Raises:
-            Exception: If connection to sender fails
-        """
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.offer_endpoint,
-                    json=offer_data,
-                    timeout=aiohttp.ClientTimeout(total=10)
-                ) as response:
-                    if response.status == 200:
-                        answer = await response.json()
-                        logger.info("Received answer from sender")
-                        return answer
-                    else:
-                        error_text = await response.text()
-                        raise Exception(f"Sender returned error {response.status}: {error_text}")
-        except aiohttp.ClientError as e:
-            logger.error(f"Failed to connect to sender: {e}")
-            raise Exception(f"Cannot reach sender at {self.sender_url}: {e}")
-        except asyncio.TimeoutError:
-            logger.error(f"Timeout connecting to sender")
-            raise Exception(f"Timeout connecting to sender at {self.sender_url}")
-
-
-async def index_handler(request):
-    """
-    Serve the main HTML page with video player and graphs.
-    
-    Returns:
-        HTML response with embedded page or file content
-    """
-    html_path = os.path.join(os.path.dirname(__file__), "index.html")
-    
-    if os.path.exists(html_path):
-        with open(html_path, "r") as f:
-            content = f.read()
-    else:
-        # Fallback HTML if file doesn't exist
-        content = """
+# Fallback HTML if index.html doesn't exist
+FALLBACK_HTML = """
 <!DOCTYPE html>
 <html>
 <head>
@@ -244,31 +195,175 @@ async def index_handler(request):
     <script src="/client.js"></script>
 </body>
 </html>
+"""
+
+# Fallback minimal JavaScript if client.js doesn't exist
+FALLBACK_JS = """
+console.log('Warning: Using fallback client.js. Please create client.js file.');
+alert('client.js not found. Please create the client.js file.');
+"""
+
+
+class WebRTCReceiver:
+    """
+    WebRTC receiver that manages connection to sender and serves web interface.
+    Acts as a proxy between web clients and the WebRTC sender.
+    """
+    
+    def __init__(self, sender_url):
         """
+        Initialize the receiver.
+        
+        Args:
+            sender_url: URL of the WebRTC sender (e.g., http://192.168.1.100:8080)
+        """
+        self.sender_url = sender_url.rstrip('/')
+        self.offer_endpoint = f"{self.sender_url}/offer"
+        self._session = None
+        logger.info(f"Receiver configured for sender: {self.sender_url}")
     
-    return web.Response(content_type="text/html", text=content)
+    async def start(self, app):
+        """
+        Create the HTTP session shared by all offers (aiohttp on_startup hook).
+        
+        Keeping one session reuses its keep-alive connection to the sender
+        instead of paying connector, DNS and TCP setup on every offer.
+        """
+        self._session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=10),
+            connector=aiohttp.TCPConnector(limit=32, keepalive_timeout=60)
+        )
+    
+    async def close(self, app):
+        """Close the shared HTTP session (aiohttp on_shutdown hook)."""
+        if self._session:
+            await self._session.close()
+    
+    async def forward_offer(self, offer_data):
+        """
+        Forward WebRTC offer to sender and return answer.
+        
+        Args:
+            offer_data: Dictionary containing SDP offer
+            
+        Returns:
+            Dictionary containing SDP answer
+            
+        Raises:
+            Exception: If connection to sender fails
+        """
+        try:
+            async with self._session.post(
+                self.offer_endpoint,
+                data=_dumps(offer_data),
+                headers={"Content-Type": "application/json"}
+            ) as response:
+                if response.status == 200:
+                    answer = _loads(await response.read())
+                    logger.info("Received answer from sender")
+                    return answer
+                else:
+                    error_text = await response.text()
+                    raise Exception(f"Sender returned error {response.status}: {error_text}")
+        except aiohttp.ClientError as e:
+            logger.error(f"Failed to connect to sender: {e}")
+            raise Exception(f"Cannot reach sender at {self.sender_url}: {e}")
+        except asyncio.TimeoutError:
+            logger.error(f"Timeout connecting to sender")
+            raise Exception(f"Timeout connecting to sender at {self.sender_url}")
 
 
-async def javascript_handler(request):
+def _load_or_fallback(path, fallback):
     """
-    Serve the JavaScript client code.
+    Read a static asset once, falling back to embedded content.
     
+    Args:
+        path: File to serve if it exists
+        fallback: Embedded text used when the file is missing
+        
     Returns:
-        JavaScript response with embedded code or file content
+        UTF-8 encoded bytes of the asset
+    """
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    logger.warning(f"{os.path.basename(path)} not found, using embedded fallback")
+    return fallback.encode("utf-8")
+
+
+def _etag(body):
+    """Strong ETag from a content hash"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _precompress(body):
     """
-    js_path = os.path.join(os.path.dirname(__file__), "client.js")
+    Compress an asset once for every supported Content-Encoding.
     
-    if os.path.exists(js_path):
-        with open(js_path, "r") as f:
-            content = f.read()
-    else:
-        # Fallback minimal JavaScript
-        content = """
-console.log('Warning: Using fallback client.js. Please create client.js file.');
-alert('client.js not found. Please create the client.js file.');
-        """
+    Args:
+        body: Uncompressed asset bytes
+        
+    Returns:
+        Dictionary mapping encoding name to body bytes ("identity" is raw)
+    """
+    bodies = {"identity": body, "gzip": gzip.compress(body, 9)}
+    if brotli is not None:
+        bodies["br"] = brotli.compress(body)
+    return bodies
+
+
+def _static_response(request, bodies, etag, content_type, cache_control):
+    """
+    Build a cacheable, precompressed response, short-circuiting to 304 on a matching ETag.
     
-    return web.Response(content_type="application/javascript", text=content)
+    Args:
+        request: Incoming aiohttp request
+        bodies: Asset bytes per encoding, from _precompress
+        etag: Precomputed ETag of the uncompressed asset
+        content_type: MIME type of the asset
+        cache_control: Cache-Control header value
+        
+    Returns:
+        304 response if the client copy is current, otherwise the asset
+    """
+    accepted = {part.split(";")[0].strip() for part in request.headers.get("Accept-Encoding", "").split(",")}
+    encoding = next((e for e in ("br", "gzip") if e in accepted and e in bodies), "identity")
+    
+    # Each encoding is a distinct representation and needs its own strong ETag
+    if encoding != "identity":
+        etag = f'{etag[:-1]}-{encoding}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if request.headers.get("If-None-Match") == etag:
+        return web.Response(status=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return web.Response(body=bodies[encoding], headers=headers, content_type=content_type, charset="utf-8")
+
+
+async def index_handler(request):
+    """
+    Serve the main HTML page with video player and graphs.
+    
+    Returns:
+        HTML response with the page loaded at startup
+    """
+    app = request.app
+    return _static_response(request, app['index_bodies'], app['index_etag'],
+                            "text/html", "public, max-age=300")
+
+
+async def javascript_handler(request):
+    """
+    Serve the JavaScript client code.
+    
+    Returns:
+        JavaScript response with the code loaded at startup
+    """
+    # The page links client.js with a content-hash query string, so a new
+    # version always has a new URL and the cached copy can be kept forever
+    app = request.app
+    return _static_response(request, app['client_js_bodies'], app['client_js_etag'],
+                            "application/javascript", "public, max-age=31536000, immutable")
 
 
 async def offer_proxy_handler(request):
@@ -282,7 +377,7 @@ async def offer_proxy_handler(request):
         JSON response with answer from sender
     """
     try:
-        offer_data = await request.json()
+        offer_data = _loads(await request.read())
         receiver = request.app['receiver']
         
         logger.info("Forwarding offer to sender...")
@@ -290,7 +385,7 @@ async def offer_proxy_handler(request):
         
         return web.Response(
             content_type="application/json",
-            text=json.dumps(answer)
+            body=_dumps(answer)
         )
         
     except Exception as e:
@@ -298,7 +393,7 @@ async def offer_proxy_handler(request):
         return web.Response(
             status=500,
             content_type="application/json",
-            text=json.dumps({"error": str(e)})
+            body=_dumps({"error": str(e)})
         )
 
 
@@ -307,20 +402,21 @@ async def config_handler(request):
     Provide configuration to web client.
     
     Returns:
-        JSON response with sender URL and other config
+        JSON response with sender URL and other config (serialized at startup)
     """
-    receiver = request.app['receiver']
-    return web.Response(
-        content_type="application/json",
-        text=json.dumps({
-            "sender_url": receiver.sender_url
-        })
-    )
+    return web.Response(body=request.app['config_body'], content_type="application/json")
 
 
 def main():
     """Main entry point for the WebRTC receiver application."""
     
+    # Prefer uvloop's libuv-based event loop when available
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+    
     parser = argparse.ArgumentParser(
         description="WebRTC Video Receiver - Display remote video stream in browser"
     )
@@ -349,6 +445,24 @@ def main():
     # Setup web application
     app = web.Application()
     app['receiver'] = receiver
+    app.on_startup.append(receiver.start)
+    app['config_body'] = _dumps({"sender_url": receiver.sender_url})
+    app.on_shutdown.append(receiver.close)
+    
+    # Static assets never change at runtime, so read them once
+    base_dir = os.path.dirname(__file__)
+    client_js = _load_or_fallback(os.path.join(base_dir, "client.js"), FALLBACK_JS)
+    client_js_etag = _etag(client_js)
+    index_html = _load_or_fallback(os.path.join(base_dir, "index.html"), FALLBACK_HTML)
+    # Cache-bust client.js by its content hash
+    index_html = index_html.replace(
+        b'src="/client.js"',
+        b'src="/client.js?v=' + client_js_etag.strip('"').encode() + b'"'
+    )
+    app['client_js_bodies'] = _precompress(client_js)
+    app['client_js_etag'] = client_js_etag
+    app['index_bodies'] = _precompress(index_html)
+    app['index_etag'] = _etag(index_html)
     
     # Add routes
     app.router.add_get("/", index_handler)
@@ -365,7 +479,8 @@ def main():
     logger.info("Open the web interface in your browser to start streaming")
     
     try:
-        web.run_app(app, host=args.host, port=args.port)
+        # No per-request access log formatting on these tiny endpoints
+        web.run_app(app, host=args.host, port=args.port, access_log=None)
     except KeyboardInterrupt:
         logger.info("Received interrupt signal")
     finally:
@@ -8,103 +8,409 @@ import argparse
 import asyncio
 import json
 import logging
+import os
+import queue
+import struct
+import threading
+import weakref
 from aiohttp import web
 from aiortc import RTCPeerConnection, RTCSessionDescription, RTCConfiguration, RTCIceServer
+from aiortc.contrib.media import MediaRecorder, MediaRelay
+from aiortc.mediastreams import MediaStreamError
 import cv2
 import numpy as np
 from av import VideoFrame
 import time
 
+try:
+    import orjson
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj):
+        return json.dumps(obj).encode("utf-8")
+    _loads = json.loads
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Frames between updates of the on-screen frame/FPS text
+OVERLAY_INTERVAL = 15
+
+# Frame inter-arrival samples kept for FPS/jitter, and how often to derive them
+IAT_WINDOW = 1024
+STATS_INTERVAL = 30
+
+# Sender heartbeat: frame count (uint64) + sender time (float64), little-endian
+HEARTBEAT = struct.Struct('<Qd')
+
+# Seconds between display/write ticks (keep-latest consumer runs at 30 Hz)
+CONSUME_INTERVAL = 1 / 30
+
+# Frames buffered for the file writer thread
+WRITE_QUEUE_SIZE = 8
+
+
+# 5x7 bitmap font for the digits 0-9, '.' and the overlay labels' letters,
+# used by the numba overlay
+_GLYPH_ROWS = [
+    ["01110", "10001", "10011", "10101", "11001", "10001", "01110"],  # 0
+    ["00100", "01100", "00100", "00100", "00100", "00100", "01110"],  # 1
+    ["01110", "10001", "00001", "00010", "00100", "01000", "11111"],  # 2
+    ["11111", "00010", "00100", "00010", "00001", "10001", "01110"],  # 3
+    ["00010", "00110", "01010", "10010", "11111", "00010", "00010"],  # 4
+    ["11111", "10000", "11110", "00001", "00001", "10001", "01110"],  # 5
+    ["00110", "01000", "10000", "11110", "10001", "10001", "01110"],  # 6
+    ["11111", "00001", "00010", "00100", "01000", "01000", "01000"],  # 7
+    ["01110", "10001", "10001", "01110", "10001", "10001", "01110"],  # 8
+    ["01110", "10001", "10001", "01111", "00001", "00010", "01100"],  # 9
+    ["00000", "00000", "00000", "00000", "00000", "01100", "01100"],  # .
+    ["00000", "01100", "01100", "00000", "01100", "01100", "00000"],  # :
+    ["11111", "10000", "10000", "11110", "10000", "10000", "10000"],  # F
+    ["00000", "00000", "10110", "11001", "10000", "10000", "10000"],  # r
+    ["00000", "00000", "01110", "00001", "01111", "10001", "01111"],  # a
+    ["00000", "00000", "11010", "10101", "10101", "10001", "10001"],  # m
+    ["00000", "00000", "01110", "10001", "11111", "10000", "01110"],  # e
+    ["11110", "10001", "10001", "11110", "10000", "10000", "10000"],  # P
+    ["01111", "10000", "10000", "01110", "00001", "00001", "11110"],  # S
+]
+GLYPHS = np.array([[[c == "1" for c in row] for row in glyph] for glyph in _GLYPH_ROWS], dtype=np.uint8)
+_GLYPH_INDEX = {ch: i for i, ch in enumerate("0123456789.:FramePS")}
+DOT_GLYPH = _GLYPH_INDEX["."]
+# Same labels as the cv2.putText fallback
+FRAME_LABEL = np.array([_GLYPH_INDEX[ch] for ch in "Frame:"], dtype=np.int64)
+FPS_LABEL = np.array([_GLYPH_INDEX[ch] for ch in "FPS:"], dtype=np.int64)
+
+try:
+    from numba import njit
+except ImportError:
+    # Without numba the display thread falls back to cv2.putText
+    overlay_frame = None
+else:
+    @njit(cache=True, fastmath=True)
+    def _blit_glyph(img, glyph_index, x0, y0, scale):
+        """Draw one glyph in green (BGR) with its top-left at (x0, y0); return the next x"""
+        height, width = img.shape[0], img.shape[1]
+        glyph = GLYPHS[glyph_index]
+        for r in range(7):
+            for c in range(5):
+                if glyph[r, c]:
+                    for dy in range(scale):
+                        yy = y0 + r * scale + dy
+                        if yy >= height:
+                            break
+                        for dx in range(scale):
+                            xx = x0 + c * scale + dx
+                            if xx >= width:
+                                break
+                            img[yy, xx, 0] = 0
+                            img[yy, xx, 1] = 255
+                            img[yy, xx, 2] = 0
+        return x0 + 6 * scale
+    
+    @njit(cache=True, fastmath=True)
+    def _blit_text(img, glyph_indices, x0, y0, scale):
+        """Draw a sequence of glyphs; return the x just past the last one"""
+        x = x0
+        for k in range(glyph_indices.shape[0]):
+            x = _blit_glyph(img, glyph_indices[k], x, y0, scale)
+        return x
+    
+    @njit(cache=True, fastmath=True)
+    def _blit_number(img, value, x0, y0, scale):
+        """Draw a non-negative integer; return the x just past its last digit"""
+        digits = np.empty(20, dtype=np.int64)
+        n = 0
+        while True:
+            digits[n] = value % 10
+            value //= 10
+            n += 1
+            if value == 0:
+                break
+        
+        x = x0
+        for k in range(n - 1, -1, -1):
+            x = _blit_glyph(img, digits[k], x, y0, scale)
+        return x
+    
+    @njit(cache=True, fastmath=True)
+    def overlay_frame(img, frame_count, fps_tenths):
+        """Draw "Frame: N" and "FPS: x.y" onto a BGR frame in place"""
+        space = 6 * 3
+        x = _blit_text(img, FRAME_LABEL, 10, 10, 3)
+        _blit_number(img, frame_count, x + space, 10, 3)
+        x = _blit_text(img, FPS_LABEL, 10, 40, 3)
+        x = _blit_number(img, fps_tenths // 10, x + space, 40, 3)
+        x = _blit_glyph(img, DOT_GLYPH, x, 40, 3)
+        _blit_number(img, fps_tenths % 10, x, 40, 3)
+
 
 class VideoReceiver:
     """Handles incoming video frames"""
     
-    def __init__(self, display=True, save_to_file=None):
+    def __init__(self, display=True, save_to_file=None, nvenc=False):
         self.display = display
         self.save_to_file = save_to_file
+        # Nothing needs pixels, so the track is recorded by MediaRecorder
+        self.record_only = bool(save_to_file) and not display
         self.frame_count = 0
         self.start_time = None
         self.video_writer = None
         self.latest_frame = None
+        self._pending_frame = None
+        self._quit = threading.Event()
+        # Exponentially weighted FPS (gain 1/16), updated once per frame
+        self._ema_fps = 0.0
+        self._last_ts = None
+        # Ring buffer of frame inter-arrival times (ms) for the /stats metrics
+        self._iat = np.empty(IAT_WINDOW, dtype=np.float32)
+        self._iat_idx = 0
+        self._iat_count = 0
+        self.fps = 0.0
+        self.jitter_ms = 0.0
+        
+        # Blocking OpenCV calls (GUI, encoding) run in their own threads so
+        # they never stall the asyncio loop servicing ICE/RTCP. The queues
+        # are small and new frames are dropped when a consumer falls behind.
+        if display:
+            self._display_queue = queue.Queue(maxsize=2)
+            threading.Thread(target=self._display_worker, daemon=True).start()
         
-        if save_to_file:
+        if self.record_only:
+            if nvenc:
+                # MediaRecorder picks its own encoder (libx264 for .mp4)
+                logger.warning("--nvenc only applies with display enabled; recording with MediaRecorder's default encoder")
+            logger.info(f"Will save video to: {save_to_file}")
+        elif save_to_file:
             # Initialize video writer (will be configured with first frame)
-            self.fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            if nvenc:
+                # Have OpenCV's FFMPEG backend encode H.264 on the GPU; must
+                # be set before the writer is opened
+                os.environ.setdefault("OPENCV_FFMPEG_WRITER_OPTIONS", "video_codec;h264_nvenc")
+                self.fourcc = cv2.VideoWriter_fourcc(*'avc1')
+            else:
+                self.fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            # Deeper than the display queue so encoder hiccups don't drop frames
+            self._write_queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+            threading.Thread(target=self._writer_worker, daemon=True).start()
             logger.info(f"Will save video to: {save_to_file}")
     
+    @staticmethod
+    def _offer(q, item):
+        """Queue item without blocking, dropping it if the consumer is behind"""
+        try:
+            q.put_nowait(item)
+        except queue.Full:
+            pass
+    
+    @staticmethod
+    def _signal_end(q):
+        """Queue the end-of-track marker, making room for it if needed"""
+        while True:
+            try:
+                q.put_nowait(None)
+                return
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    pass
+    
+    def _display_worker(self):
+        """Show frames in an OpenCV window (runs in its own thread)"""
+        frame_text = fps_text = ""
+        last_refresh = 0
+        while True:
+            item = self._display_queue.get()
+            if item is None:
+                cv2.destroyAllWindows()
+                continue
+            
+            img, frame_count, fps = item
+            if overlay_frame is not None:
+                # JIT-compiled bitmap text, FPS to one decimal like the fallback
+                overlay_frame(img, frame_count, int(fps * 10))
+            else:
+                # Refresh the overlay text only every OVERLAY_INTERVAL frames.
+                # frame_count skips the frames the consumer dropped, so compare
+                # against the last refresh rather than testing for a multiple.
+                if not frame_text or frame_count - last_refresh >= OVERLAY_INTERVAL:
+                    last_refresh = frame_count
+                    frame_text = f"Frame: {frame_count}"
+                    fps_text = f"FPS: {fps:.1f}"
+                cv2.putText(img, frame_text, (10, 30),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+                cv2.putText(img, fps_text, (10, 60),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            
+            cv2.imshow("WebRTC Receiver", img)
+            
+            # Stop on 'q' key
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                logger.info("User requested quit")
+                self._quit.set()
+    
+    def _writer_worker(self):
+        """Encode frames to the output file (runs in its own thread)"""
+        while True:
+            img = self._write_queue.get()
+            if img is None:
+                if self.video_writer:
+                    self.video_writer.release()
+                    self.video_writer = None
+                    logger.info(f"Video saved to {self.save_to_file}")
+                continue
+            
+            # Initialize video writer with first frame dimensions
+            if self.video_writer is None:
+                height, width = img.shape[:2]
+                self.video_writer = cv2.VideoWriter(
+                    self.save_to_file, 
+                    self.fourcc, 
+                    30.0, 
+                    (width, height)
+                )
+                logger.info(f"Initialized video writer: {width}x{height}")
+            
+            self.video_writer.write(img)
+    
+    def _update_stats(self):
+        """Derive FPS and jitter from the inter-arrival window in one vectorized pass"""
+        window = self._iat[:self._iat_count]
+        mean = float(window.mean())
+        self.fps = 1000.0 / mean if mean > 0 else 0.0
+        self.jitter_ms = float(window.std())
+    
+    @staticmethod
+    def _to_bgr(frame):
+        """
+        Convert a decoded frame to a BGR array.
+        
+        Decoded frames are already yuv420p, so take the planes as-is and do
+        the single YUV->BGR conversion in OpenCV's SIMD path.
+        """
+        yuv = frame.to_ndarray(format="yuv420p")
+        return cv2.cvtColor(yuv, cv2.COLOR_YUV2BGR_I420)
+    
+    async def _consume_frames(self):
+        """
+        Convert and hand off only the newest frame at a fixed cadence.
+        
+        Frames that arrive between ticks are skipped rather than queued, so a
+        slow display or encoder never makes the output fall progressively behind.
+        """
+        handled = 0
+        while True:
+            await asyncio.sleep(CONSUME_INTERVAL)
+            frame = self._pending_frame
+            if frame is None or handled == self.frame_count:
+                continue
+            handled = self.frame_count
+            
+            # Convert in a worker thread (PyAV and OpenCV release the GIL)
+            # so the loop keeps servicing ICE/RTCP and track.recv()
+            img = await asyncio.to_thread(self._to_bgr, frame)
+            self.latest_frame = img
+            
+            # Save frame
+            if self.save_to_file:
+                self._offer(self._write_queue, img)
+            
+            # Display frame
+            if self.display:
+                # The overlay is drawn in place, so don't share the array with the writer
+                shown = img.copy() if self.save_to_file else img
+                self._offer(self._display_queue, (shown, handled, self._ema_fps))
+    
+    def _count_frame(self):
+        """Update the frame count and FPS/jitter stats for one received frame"""
+        now = time.monotonic_ns()
+        if self.start_time is None:
+            self.start_time = time.time()
+            logger.info("✓ First frame received!")
+        else:
+            dt = now - self._last_ts
+            inst = 1e9 / dt if dt else 0.0
+            self._ema_fps += (inst - self._ema_fps) / 16
+            self._iat[self._iat_idx] = dt / 1e6
+            self._iat_idx = (self._iat_idx + 1) % IAT_WINDOW
+            self._iat_count = min(self._iat_count + 1, IAT_WINDOW)
+        self._last_ts = now
+        
+        self.frame_count += 1
+        
+        if self.frame_count % STATS_INTERVAL == 0 and self._iat_count:
+            self._update_stats()
+    
+    async def record_track(self, track):
+        """
+        Save a track with aiortc's MediaRecorder (save-only mode).
+        
+        Frames go straight from the decoder to PyAV's encoder/muxer, skipping
+        the BGR conversion, the consumer loop and the OpenCV writer thread.
+        A second relay subscription only counts frames, so /stats and the
+        status page still report frames, FPS and jitter.
+        """
+        logger.info("✓ Recording video track...")
+        relay = MediaRelay()
+        counted = relay.subscribe(track)
+        
+        recorder = MediaRecorder(self.save_to_file)
+        recorder.addTrack(relay.subscribe(track))
+        await recorder.start()
+        try:
+            while True:
+                await counted.recv()
+                self._count_frame()
+        except MediaStreamError:
+            pass
+        finally:
+            await recorder.stop()
+            logger.info(f"Total frames received: {self.frame_count}")
+            logger.info(f"Video saved to {self.save_to_file}")
+    
     async def process_track(self, track):
         """Process incoming video track"""
         logger.info("✓ Receiving video track...")
+        # A 'q' only ends the track it was pressed on; the next sender starts fresh
+        self._quit.clear()
+        
+        # Nothing consumes pixels in headless, non-recording mode
+        consumer = None
+        if self.display or self.save_to_file:
+            consumer = asyncio.ensure_future(self._consume_frames())
         
         try:
-            while True:
-                frame = await track.recv()
-                
-                if self.start_time is None:
-                    self.start_time = time.time()
-                    logger.info("✓ First frame received! Starting display...")
-                
-                # Convert VideoFrame to numpy array
-                img = frame.to_ndarray(format="bgr24")
-                self.latest_frame = img
-                self.frame_count += 1
-                
-                # Initialize video writer with first frame dimensions
-                if self.save_to_file and self.video_writer is None:
-                    height, width = img.shape[:2]
-                    self.video_writer = cv2.VideoWriter(
-                        self.save_to_file, 
-                        self.fourcc, 
-                        30.0, 
-                        (width, height)
-                    )
-                    logger.info(f"Initialized video writer: {width}x{height}")
-                
-                # Save frame
-                if self.video_writer:
-                    self.video_writer.write(img)
-                
-                # Display frame
-                if self.display:
-                    # Add frame info
-                    elapsed = time.time() - self.start_time
-                    fps = self.frame_count / elapsed if elapsed > 0 else 0
-                    
-                    cv2.putText(img, f"Frame: {self.frame_count}", (10, 30),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                    cv2.putText(img, f"FPS: {fps:.1f}", (10, 60),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                    
-                    cv2.imshow("WebRTC Receiver", img)
-                    
-                    # Break on 'q' key
-                    if cv2.waitKey(1) & 0xFF == ord('q'):
-                        logger.info("User requested quit")
-                        break
+            # Pull frames as fast as they arrive and only remember the newest
+            while not self._quit.is_set():
+                self._pending_frame = await track.recv()
+                self._count_frame()
                 
         except Exception as e:
             logger.error(f"Error processing track: {e}")
         finally:
-            if self.video_writer:
-                self.video_writer.release()
-                logger.info(f"Video saved to {self.save_to_file}")
+            if consumer:
+                consumer.cancel()
+            self._pending_frame = None
+            if self.save_to_file:
+                self._signal_end(self._write_queue)
             if self.display:
-                cv2.destroyAllWindows()
+                self._signal_end(self._display_queue)
             
             logger.info(f"Total frames received: {self.frame_count}")
 
 
-# Global variables
-pcs = set()
-video_receiver = None
+def handle_channel_message(data, raw):
+    """Handle one decoded data channel message"""
+    if isinstance(data, dict) and "frames" in data:
+        logger.debug("Sender stats: %s", data)
+    else:
+        logger.debug("Received: %s", raw)
 
 
 async def offer_handler(request):
     """Handle incoming WebRTC offer from sender"""
-    params = await request.json()
+    params = _loads(await request.read())
     offer = RTCSessionDescription(sdp=params["sdp"], type=params["type"])
     
     logger.info("Received offer from sender")
@@ -117,6 +423,9 @@ async def offer_handler(request):
         ]
     )
     
+    pcs = request.app['pcs']
+    video_receiver = request.app['video_receiver']
+    
     pc = RTCPeerConnection(configuration=config)
     pcs.add(pc)
     
@@ -141,7 +450,11 @@ async def offer_handler(request):
     def on_track(track):
         logger.info(f"Received track: {track.kind}")
         if track.kind == "video":
-            asyncio.ensure_future(video_receiver.process_track(track))
+            if video_receiver.record_only:
+                # Nothing needs pixels, so let aiortc write the file itself
+                asyncio.ensure_future(video_receiver.record_track(track))
+            else:
+                asyncio.ensure_future(video_receiver.process_track(track))
         
         @track.on("ended")
         async def on_ended():
@@ -153,12 +466,16 @@ async def offer_handler(request):
         
         @channel.on("message")
         def on_message(message):
+            if isinstance(message, bytes) and len(message) == HEARTBEAT.size:
+                frames, timestamp = HEARTBEAT.unpack(message)
+                handle_channel_message({"frames": frames, "timestamp": timestamp}, message)
+                return
+            # Decode each message as it arrives; orjson takes str and bytes alike
             try:
-                data = json.loads(message)
-                if "frames" in data:
-                    logger.debug(f"Sender stats: {data}")
-            except:
-                logger.debug(f"Received: {message}")
+                data = _loads(message)
+            except ValueError:
+                data = None
+            handle_channel_message(data, message)
     
     # Set remote description and create answer
     await pc.setRemoteDescription(offer)
@@ -169,53 +486,53 @@ async def offer_handler(request):
     
     return web.Response(
         content_type="application/json",
-        text=json.dumps({
+        body=_dumps({
             "sdp": pc.localDescription.sdp,
             "type": pc.localDescription.type
         })
     )
 
 
-async def index(request):
-    """Simple status page"""
-    html = f"""
+# Status page, pre-split into constant byte chunks around its three dynamic
+# values so each request is just a few concatenations
+INDEX_HTML = """
     <!DOCTYPE html>
     <html>
     <head>
         <title>WebRTC Receiver</title>
         <style>
-            body {{ 
+            body { 
                 font-family: Arial; 
                 padding: 40px; 
                 background: #f0f0f0;
                 max-width: 800px;
                 margin: 0 auto;
-            }}
-            .status {{ 
+            }
+            .status { 
                 background: white; 
                 padding: 30px; 
                 border-radius: 10px;
                 box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-            }}
-            h1 {{ color: #333; }}
-            .info {{ 
+            }
+            h1 { color: #333; }
+            .info { 
                 background: #e8f5e9; 
                 padding: 15px; 
                 border-radius: 5px;
                 margin: 20px 0;
-            }}
-            code {{ 
+            }
+            code { 
                 background: #f5f5f5; 
                 padding: 2px 6px; 
                 border-radius: 3px;
                 font-family: monospace;
-            }}
-            .connections {{
+            }
+            .connections {
                 margin-top: 20px;
                 padding: 15px;
                 background: #fff3cd;
                 border-radius: 5px;
-            }}
+            }
         </style>
     </head>
     <body>
@@ -223,42 +540,80 @@ async def index(request):
             <h1>🎥 WebRTC Receiver</h1>
             <div class="info">
                 <strong>Status:</strong> Ready to receive streams<br>
-                <strong>Active connections:</strong> <span id="connections">{len(pcs)}</span><br>
-                <strong>Frames received:</strong> <span id="frames">{video_receiver.frame_count if video_receiver else 0}</span>
+                <strong>Active connections:</strong> <span id="connections">@CONNECTIONS@</span><br>
+                <strong>Frames received:</strong> <span id="frames">@FRAMES@</span>
             </div>
             
             <h2>How to connect:</h2>
             <div class="connections">
                 <p>From the sender machine, run:</p>
-                <code>python3 webrtc_sender.py --receiver-ip YOUR_IP --receiver-port {request.host.split(':')[1] if ':' in request.host else 8082}</code>
+                <code>python3 webrtc_sender.py --receiver-ip YOUR_IP --receiver-port @PORT@</code>
             </div>
             
             <p><small>This page auto-refreshes every 2 seconds</small></p>
         </div>
         
         <script>
-            setInterval(() => {{
+            setInterval(() => {
                 fetch('/stats')
                     .then(r => r.json())
-                    .then(data => {{
+                    .then(data => {
                         document.getElementById('connections').textContent = data.connections;
                         document.getElementById('frames').textContent = data.frames;
-                    }});
-            }}, 2000);
+                    });
+            }, 2000);
         </script>
     </body>
     </html>
     """
-    return web.Response(content_type="text/html", text=html)
+_INDEX_PREFIX, _rest = INDEX_HTML.split("@CONNECTIONS@")
+_INDEX_MIDDLE, _rest = _rest.split("@FRAMES@")
+_INDEX_PORT_PREFIX, _INDEX_SUFFIX = _rest.split("@PORT@")
+_INDEX_PREFIX = _INDEX_PREFIX.encode("utf-8")
+_INDEX_MIDDLE = _INDEX_MIDDLE.encode("utf-8")
+_INDEX_PORT_PREFIX = _INDEX_PORT_PREFIX.encode("utf-8")
+_INDEX_SUFFIX = _INDEX_SUFFIX.encode("utf-8")
+del _rest
+
+
+async def index(request):
+    """Simple status page"""
+    pcs = request.app['pcs']
+    video_receiver = request.app['video_receiver']
+    frames = video_receiver.frame_count if video_receiver else 0
+    port = request.host.rpartition(':')[2]
+    if not port.isdigit():
+        # Host is client-supplied; only echo a plain port number into the page
+        port = "8082"
+    body = (_INDEX_PREFIX + str(len(pcs)).encode() +
+            _INDEX_MIDDLE + str(frames).encode() +
+            _INDEX_PORT_PREFIX + port.encode() +
+            _INDEX_SUFFIX)
+    return web.Response(content_type="text/html", charset="utf-8", body=body)
 
 
 async def stats_handler(request):
     """Return current statistics"""
+    pcs = request.app['pcs']
+    video_receiver = request.app['video_receiver']
+    connections = len(pcs)
+    frames = video_receiver.frame_count if video_receiver else 0
+    
+    # FPS/jitter only change when frames arrive, so (connections, frames)
+    # identifies the payload and idle polls can be answered with a 304
+    etag = f'"{hash((connections, frames)) & 0xFFFFFFFFFFFFFFFF:x}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("If-None-Match") == etag:
+        return web.Response(status=304, headers=headers)
+    
     return web.Response(
         content_type="application/json",
-        text=json.dumps({
-            "connections": len(pcs),
-            "frames": video_receiver.frame_count if video_receiver else 0
+        headers=headers,
+        body=_dumps({
+            "connections": connections,
+            "frames": frames,
+            "fps": round(video_receiver.fps, 2) if video_receiver else 0,
+            "jitter_ms": round(video_receiver.jitter_ms, 2) if video_receiver else 0
         })
     )
 
@@ -266,29 +621,35 @@ async def stats_handler(request):
 async def on_shutdown(app):
     """Cleanup on shutdown"""
     logger.info("Shutting down...")
-    coros = [pc.close() for pc in pcs]
-    await asyncio.gather(*coros)
-    pcs.clear()
+    # Snapshot first; closing a connection discards it from the set
+    await asyncio.gather(*(pc.close() for pc in list(app['pcs'])))
 
 
 def main():
-    global video_receiver
+    # Prefer uvloop's libuv-based event loop when available
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
     
     parser = argparse.ArgumentParser(description="WebRTC Video Receiver")
     parser.add_argument("--host", default="0.0.0.0", help="Host to bind to")
     parser.add_argument("--port", type=int, default=8082, help="Port to bind to")
     parser.add_argument("--no-display", action="store_true", help="Disable video display window")
     parser.add_argument("--save-video", help="Save received video to file (e.g., output.mp4)")
+    parser.add_argument("--nvenc", action="store_true", help="Encode the saved video with NVENC (needs OpenCV built with FFMPEG + NVENC)")
     args = parser.parse_args()
     
-    # Initialize video receiver
-    video_receiver = VideoReceiver(
-        display=not args.no_display,
-        save_to_file=args.save_video
-    )
-    
     # Setup web application
     app = web.Application()
+    # Peer connections that are dropped without a state change get collected
+    app['pcs'] = weakref.WeakSet()
+    app['video_receiver'] = VideoReceiver(
+        display=not args.no_display,
+        save_to_file=args.save_video,
+        nvenc=args.nvenc
+    )
     app.on_shutdown.append(on_shutdown)
     app.router.add_get("/", index)
     app.router.add_post("/offer", offer_handler)
@@ -307,7 +668,8 @@ def main():
     logger.info("=" * 60)
     
     try:
-        web.run_app(app, host=args.host, port=args.port)
+        # No per-request access log formatting on these tiny endpoints
+        web.run_app(app, host=args.host, port=args.port, access_log=None)
     except KeyboardInterrupt:
         logger.info("Stopped by user")
 
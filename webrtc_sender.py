@@ -6,16 +6,21 @@ Usage: python3 webrtc_sender.py --receiver-ip 192.168.1.100 --receiver-port 8082
 
 import argparse
 import asyncio
+import collections
 import fractions
-import json
+import itertools
 import logging
+import struct
 import threading
 import time
 import aiohttp
-from aiortc import MediaStreamTrack, RTCPeerConnection, RTCSessionDescription, RTCConfiguration, RTCIceServer
+from aiortc import MediaStreamTrack, RTCPeerConnection, RTCRtpSender, RTCSessionDescription, RTCConfiguration, RTCIceServer
+import av
 from av import VideoFrame
+from av.error import FFmpegError
 import cv2
 import rclpy
+from rclpy.executors import MultiThreadedExecutor
 from rclpy.node import Node
 from sensor_msgs.msg import Image
 import numpy as np
@@ -23,9 +28,25 @@ import numpy as np
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Heartbeat payload: frame count (uint64) + sender time (float64),
+# little-endian, sent as a 16-byte binary data channel message
+HEARTBEAT = struct.Struct('<Qd')
 
-def imgmsg_to_cv2(img_msg):
-    """Convert ROS Image message to OpenCV image"""
+YUYV_ENCODINGS = ('yuyv', 'yuyv422', 'yuy2')
+
+
+def imgmsg_to_cv2(img_msg, dst=None):
+    """
+    Convert ROS Image message to OpenCV image.
+    
+    Returns (image, is_rgb). rgb8 frames are left in RGB, which is what the
+    video track hands to the encoder, rather than going through BGR and back
+    in recv(). YUYV frames never come through here; CameraNode splits them
+    into I420 planes directly.
+    
+    If given, dst is an (H, W, 3) uint8 array that the mono8 conversion
+    writes into instead of allocating.
+    """
     if img_msg.encoding == 'rgb8':
         dtype = np.uint8
         n_channels = 3
@@ -35,26 +56,47 @@ def imgmsg_to_cv2(img_msg):
     elif img_msg.encoding == 'mono8':
         dtype = np.uint8
         n_channels = 1
-    elif img_msg.encoding in ['yuyv', 'yuyv422', 'yuy2']:
-        dtype = np.uint8
-        n_channels = 2
     else:
         raise ValueError(f"Unsupported encoding: {img_msg.encoding}")
     
-    img_buf = np.asarray(img_msg.data, dtype=dtype)
+    # View the message payload (array.array/bytes) in place instead of copying it
+    try:
+        img_buf = np.frombuffer(img_msg.data, dtype=dtype)
+    except TypeError:
+        img_buf = np.asarray(img_msg.data, dtype=dtype)
     
-    if img_msg.encoding in ['yuyv', 'yuyv422', 'yuy2']:
-        cv_img = img_buf.reshape((img_msg.height, img_msg.width, 2))
-        cv_img = cv2.cvtColor(cv_img, cv2.COLOR_YUV2BGR_YUY2)
-    elif n_channels == 1:
+    if n_channels == 1:
         cv_img = img_buf.reshape(img_msg.height, img_msg.width)
-    else:
-        cv_img = img_buf.reshape(img_msg.height, img_msg.width, n_channels)
+        return cv2.cvtColor(cv_img, cv2.COLOR_GRAY2RGB, dst=dst), True
     
-    if img_msg.encoding == 'rgb8':
-        cv_img = cv2.cvtColor(cv_img, cv2.COLOR_RGB2BGR)
+    cv_img = img_buf.reshape(img_msg.height, img_msg.width, n_channels)
+    return cv_img, img_msg.encoding == 'rgb8'
+
+
+def i420_planes(buf, width, height):
+    """Return (Y, U, V) views into a (H * 3 / 2, W) I420 buffer"""
+    flat = buf.reshape(-1)
+    luma = width * height
+    chroma = luma // 4
+    return (
+        flat[:luma].reshape(height, width),
+        flat[luma:luma + chroma].reshape(height // 2, width // 2),
+        flat[luma + chroma:].reshape(height // 2, width // 2),
+    )
+
+
+def split_yuyv(yuyv, y, u, v):
+    """
+    Deinterleave (H, W, 2) YUYV into planar Y (H, W), U and V (H/2, W/2).
     
-    return cv_img
+    Chroma is already half width; taking every other row makes it 4:2:0.
+    Strided copies only, no colour math.
+    """
+    height, width = y.shape
+    quads = yuyv.reshape(height, width // 2, 4)
+    y.reshape(height, width // 2, 2)[...] = quads[:, :, 0::2]
+    u[...] = quads[0::2, :, 1]
+    v[...] = quads[0::2, :, 3]
 
 
 class CameraNode(Node):
@@ -63,10 +105,32 @@ class CameraNode(Node):
     def __init__(self, camera_topic, resolution=(640, 480)):
         super().__init__('webrtc_sender_node')
         
-        self.latest_frame = None
         self.resolution = resolution
         self.frame_lock = threading.Lock()
         self.frame_count = 0
+        # Counted outside the lock; next() on a count is atomic under the GIL
+        self._counter = itertools.count(1)
+        
+        # Triple buffer of planar I420 frames, shape (H * 3 / 2, W). The
+        # callback fills the write slot and swaps it with the ready slot; the
+        # track swaps the ready slot into its read slot. The lock only covers
+        # the index swaps, and frames are never copied between threads.
+        width, height = resolution
+        self._buffers = [np.empty((height * 3 // 2, width), dtype=np.uint8) for _ in range(3)]
+        self._write_idx = 0
+        self._ready_idx = 1
+        self._read_idx = 2
+        self._fresh = False
+        # Reader-side flag: has the track swapped in a frame yet
+        self._has_frame = False
+        # Bumped each time get_frame() swaps in a new frame (reader side)
+        self.read_seq = 0
+        # Scratch target for cv2.resize, only touched by the callback
+        self._resize_buf = np.empty((height, width, 3), dtype=np.uint8)
+        # Planar scratch for YUYV frames that still need resizing
+        self._yuyv_buf = None
+        # Camera-sized RGB scratch for mono8 expansion
+        self._cvt_buf = None
         
         self.subscription = self.create_subscription(
             Image,
@@ -81,23 +145,94 @@ class CameraNode(Node):
     def image_callback(self, msg):
         """Process incoming camera images"""
         try:
-            if self.latest_frame is None:
+            if self.frame_count == 0:
                 self.get_logger().info(f'First frame! {msg.width}x{msg.height}, {msg.encoding}')
             
-            cv_image = imgmsg_to_cv2(msg)
-            resized = cv2.resize(cv_image, self.resolution, interpolation=cv2.INTER_LANCZOS4)
+            if msg.encoding in YUYV_ENCODINGS:
+                self._yuyv_to_i420(msg, self._buffers[self._write_idx])
+            else:
+                self._to_i420(msg, self._buffers[self._write_idx])
             
             with self.frame_lock:
-                self.latest_frame = resized
-                self.frame_count += 1
+                self._write_idx, self._ready_idx = self._ready_idx, self._write_idx
+                self._fresh = True
+            self.frame_count = next(self._counter)
             
         except Exception as e:
             self.get_logger().error(f'Error in image callback: {str(e)}')
     
+    def _yuyv_to_i420(self, msg, dst):
+        """YUYV is already YUV: split it into planes and resize each one"""
+        try:
+            data = np.frombuffer(msg.data, dtype=np.uint8)
+        except TypeError:
+            data = np.asarray(msg.data, dtype=np.uint8)
+        yuyv = data.reshape(msg.height, msg.width, 2)
+        
+        width, height = self.resolution
+        planes = i420_planes(dst, width, height)
+        if (msg.width, msg.height) == self.resolution:
+            split_yuyv(yuyv, *planes)
+            return
+        
+        if self._yuyv_buf is None or self._yuyv_buf.shape != (msg.height * 3 // 2, msg.width):
+            self._yuyv_buf = np.empty((msg.height * 3 // 2, msg.width), dtype=np.uint8)
+        src = i420_planes(self._yuyv_buf, msg.width, msg.height)
+        split_yuyv(yuyv, *src)
+        
+        interpolation = cv2.INTER_AREA if msg.width > width else cv2.INTER_LINEAR
+        for s, d in zip(src, planes):
+            cv2.resize(s, (d.shape[1], d.shape[0]), dst=d, interpolation=interpolation)
+    
+    def _to_i420(self, msg, dst):
+        """Convert an RGB/BGR/mono frame, resizing first if needed"""
+        cvt_buf = None
+        if msg.encoding == 'mono8':
+            if self._cvt_buf is None or self._cvt_buf.shape[:2] != (msg.height, msg.width):
+                self._cvt_buf = np.empty((msg.height, msg.width, 3), dtype=np.uint8)
+            cvt_buf = self._cvt_buf
+        cv_image, is_rgb = imgmsg_to_cv2(msg, dst=cvt_buf)
+        height, width = cv_image.shape[:2]
+        if (width, height) == self.resolution:
+            resized = cv_image
+        else:
+            # Area averaging for downscales, bilinear for upscales; the
+            # encoder can't tell the difference from Lanczos
+            interpolation = cv2.INTER_AREA if width > self.resolution[0] else cv2.INTER_LINEAR
+            resized = cv2.resize(cv_image, self.resolution, dst=self._resize_buf,
+                                 interpolation=interpolation)
+        
+        # Convert once to the encoder's native yuv420p (1.5 bytes/pixel),
+        # straight into the slot nobody else is looking at
+        cv2.cvtColor(
+            resized,
+            cv2.COLOR_RGB2YUV_I420 if is_rgb else cv2.COLOR_BGR2YUV_I420,
+            dst=dst
+        )
+    
     def get_frame(self):
-        """Return the latest frame (thread-safe)"""
+        """
+        Return the latest I420 frame (thread-safe).
+        
+        The array stays valid until the next get_frame() call; there is a
+        single reader (the video track), which copies it into a VideoFrame.
+        """
         with self.frame_lock:
-            return self.latest_frame.copy() if self.latest_frame is not None else None
+            if self._fresh:
+                self._read_idx, self._ready_idx = self._ready_idx, self._read_idx
+                self._fresh = False
+                self._has_frame = True
+                self.read_seq += 1
+        return self._buffers[self._read_idx] if self._has_frame else None
+
+
+def _fill_plane(plane, src):
+    """Copy a 2-D uint8 array into a VideoFrame plane, honouring its row padding"""
+    height, width = src.shape
+    if plane.line_size == width:
+        plane.update(src)
+    else:
+        np.frombuffer(plane, dtype=np.uint8).reshape(height, plane.line_size)[:, :width] = src
 
 
 class VideoStreamTrack(MediaStreamTrack):
@@ -110,96 +245,208 @@ class VideoStreamTrack(MediaStreamTrack):
         self.fps = fps
         self._start = None
         self._timestamp = 0
+        # Monotonic time the next frame is due
+        self._next_time = None
+        # Preallocated output frames whose planes are overwritten in place.
+        # Two alternate so an encoder still holding the previous frame's
+        # buffers never sees them change underneath it.
+        width, height = ros_node.resolution
+        self._frames = [VideoFrame(width, height, "yuv420p") for _ in range(2)]
+        self._frame_idx = 0
+        # Last frame built and the read_seq it came from
+        self._last_frame = None
+        self._last_seq = 0
+        
+        # "Waiting for camera..." frame, rasterized once. It's the same size
+        # as camera frames, so a fixed-size encoder accepts it too.
+        placeholder = np.zeros((height, width, 3), dtype=np.uint8)
+        cv2.putText(placeholder, "Waiting for camera...", (width // 2 - 170, height // 2), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        self._placeholder_frame = VideoFrame.from_ndarray(
+            cv2.cvtColor(placeholder, cv2.COLOR_RGB2YUV_I420), format="yuv420p"
+        )
     
     async def recv(self):
         """Generate video frames"""
+        # Pace on a fixed monotonic cadence so the frame period is
+        # max(work, 1/fps) rather than work + 1/fps
         if self._start is None:
-            self._start = time.time()
+            self._start = self._next_time = time.monotonic()
+        else:
+            self._next_time += 1.0 / self.fps
+            delay = self._next_time - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif delay < -0.1:
+                # Too far behind: drop the missed frames instead of bursting
+                self._next_time = time.monotonic()
         
-        # Calculate timestamp manually
-        now = time.time()
-        elapsed = now - self._start
-        pts = int(elapsed * 90000)  # 90kHz clock
+        # Timestamp from the schedule
+        pts = int((self._next_time - self._start) * 90000)  # 90kHz clock
         time_base = fractions.Fraction(1, 90000)
         
+        # The copy/conversion work releases the GIL, so run it in a worker
+        # thread and keep the loop free for ICE/DTLS/SCTP traffic
+        return await asyncio.to_thread(self._build_frame_sync, pts, time_base)
+    
+    def _build_frame_sync(self, pts, time_base):
+        """Wrap the latest camera frame (or a placeholder) in a VideoFrame"""
         frame = self.ros_node.get_frame()
         
         if frame is None:
-            frame = np.zeros((480, 640, 3), dtype=np.uint8)
-            cv2.putText(frame, "Waiting for camera...", (150, 240), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+            # Its content never changes, so it can be handed out repeatedly
+            video_frame = self._placeholder_frame
+            video_frame.pts = pts
+            video_frame.time_base = time_base
+            return video_frame
+        
+        if self.ros_node.read_seq == self._last_seq and self._last_frame is not None:
+            # Camera is slower than the stream: resend the same pixels with a new pts
+            video_frame = self._last_frame
+            video_frame.pts = pts
+            video_frame.time_base = time_base
+            return video_frame
         
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        video_frame = VideoFrame.from_ndarray(frame_rgb, format="rgb24")
+        # Hand yuv420p straight to the encoder so it doesn't convert from RGB
+        video_frame = self._frames[self._frame_idx]
+        self._frame_idx ^= 1
+        planes = i420_planes(frame, frame.shape[1], frame.shape[0] * 2 // 3)
+        for plane, src in zip(video_frame.planes, planes):
+            _fill_plane(plane, src)
         video_frame.pts = pts
         video_frame.time_base = time_base
-        
-        await asyncio.sleep(1.0 / self.fps)
-        
+        self._last_frame = video_frame
+        self._last_seq = self.ros_node.read_seq
         return video_frame
 
 
-async def send_stream(receiver_url, camera_topic, resolution, fps):
+class EncodedStreamTrack(VideoStreamTrack):
+    """
+    Video track that encodes H.264 on the GPU (NVENC) and hands aiortc the
+    packets, which it packetizes without running its software encoder.
+    """
+    
+    def __init__(self, ros_node, fps=30, codec_name="h264_nvenc"):
+        super().__init__(ros_node, fps)
+        width, height = ros_node.resolution
+        encoder = av.CodecContext.create(codec_name, "w")
+        encoder.width = width
+        encoder.height = height
+        encoder.pix_fmt = "yuv420p"
+        encoder.time_base = fractions.Fraction(1, 90000)
+        encoder.framerate = fractions.Fraction(fps, 1)
+        # One packet out per frame in, no B-frames, periodic keyframes since
+        # PLI/FIR requests aren't forwarded to this encoder
+        encoder.gop_size = fps
+        encoder.options = {
+            "profile": "baseline",
+            "preset": "p1",
+            "tune": "ll",
+            "zerolatency": "1",
+            "delay": "0",
+        }
+        encoder.open()
+        self._encoder = encoder
+        self._packets = collections.deque()
+    
+    async def recv(self):
+        """Return the next encoded H.264 packet"""
+        while not self._packets:
+            frame = await super().recv()
+            packets = await asyncio.to_thread(self._encoder.encode, frame)
+            for packet in packets:
+                packet.pts = frame.pts
+                packet.time_base = frame.time_base
+            self._packets.extend(packets)
+        return self._packets.popleft()
+
+
+def create_video_track(ros_node, fps, nvenc=False):
+    """Build the outgoing track, falling back to software encoding if NVENC can't be opened"""
+    if nvenc:
+        try:
+            return EncodedStreamTrack(ros_node, fps)
+        except (FFmpegError, ValueError) as e:
+            logger.warning(f"NVENC unavailable ({e}); using aiortc's software encoder")
+    return VideoStreamTrack(ros_node, fps)
+
+
+async def send_stream(receiver_url, camera_topic, resolution, fps, nvenc=False):
     """Connect to receiver and stream video"""
     
     # Initialize ROS2
     rclpy.init()
     ros_node = CameraNode(camera_topic, resolution)
     
-    # Run ROS2 node in separate thread
-    ros_thread = threading.Thread(target=lambda: rclpy.spin(ros_node), daemon=True)
-    ros_thread.start()
-    
-    logger.info("Waiting for camera frames...")
-    await asyncio.sleep(2)
-    
-    # Configure WebRTC
-    config = RTCConfiguration(
-        iceServers=[
-            RTCIceServer(urls=["stun:stun.l.google.com:19302"]),
-            RTCIceServer(urls=["stun:stun1.l.google.com:19302"])
-        ]
-    )
-    
-    pc = RTCPeerConnection(configuration=config)
-    
-    # Add video track
-    video_track = VideoStreamTrack(ros_node, fps)
-    pc.addTrack(video_track)
-    
-    # Create data channel
-    channel = pc.createDataChannel("control")
-    
-    @channel.on("open")
-    def on_open():
-        logger.info("✓ Data channel opened")
-    
-    @channel.on("message")
-    def on_message(message):
-        logger.info(f"Received message: {message}")
-    
-    @pc.on("connectionstatechange")
-    async def on_connectionstatechange():
-        logger.info(f"Connection state: {pc.connectionState}")
-        if pc.connectionState == "connected":
-            logger.info("✓ Connected! Streaming video...")
-        elif pc.connectionState == "failed":
-            logger.error("✗ Connection failed!")
-        elif pc.connectionState == "closed":
-            logger.info("Connection closed")
-    
-    @pc.on("iceconnectionstatechange")
-    async def on_iceconnectionstatechange():
-        logger.info(f"ICE connection state: {pc.iceConnectionState}")
-    
-    # Create offer
-    offer = await pc.createOffer()
-    await pc.setLocalDescription(offer)
-    
-    logger.info(f"Connecting to receiver at {receiver_url}...")
+    # Let an executor dispatch the camera callbacks from its own threads,
+    # away from the asyncio loop driving the encoder
+    executor = MultiThreadedExecutor(num_threads=2)
+    executor.add_node(ros_node)
+    threading.Thread(target=executor.spin, daemon=True).start()
     
-    # Send offer to receiver
-    async with aiohttp.ClientSession() as session:
+    # Everything from here on is torn down in the finally, including when
+    # setup or the offer POST fails
+    pc = None
+    session = None
+    try:
+        logger.info("Waiting for camera frames...")
+        await asyncio.sleep(2)
+        
+        # Configure WebRTC
+        config = RTCConfiguration(
+            iceServers=[
+                RTCIceServer(urls=["stun:stun.l.google.com:19302"]),
+                RTCIceServer(urls=["stun:stun1.l.google.com:19302"])
+            ]
+        )
+        
+        pc = RTCPeerConnection(configuration=config)
+        
+        # Add video track
+        video_track = create_video_track(ros_node, fps, nvenc)
+        sender = pc.addTrack(video_track)
+        
+        if isinstance(video_track, EncodedStreamTrack):
+            # Pre-encoded packets are H.264, so that's the only codec to offer
+            capabilities = RTCRtpSender.getCapabilities("video")
+            h264 = [c for c in capabilities.codecs if c.mimeType == "video/H264"]
+            transceiver = next(t for t in pc.getTransceivers() if t.sender is sender)
+            transceiver.setCodecPreferences(h264)
+        
+        # Create data channel
+        channel = pc.createDataChannel("control")
+        
+        @channel.on("open")
+        def on_open():
+            logger.info("✓ Data channel opened")
+        
+        @channel.on("message")
+        def on_message(message):
+            logger.info(f"Received message: {message}")
+        
+        @pc.on("connectionstatechange")
+        async def on_connectionstatechange():
+            logger.info(f"Connection state: {pc.connectionState}")
+            if pc.connectionState == "connected":
+                logger.info("✓ Connected! Streaming video...")
+            elif pc.connectionState == "failed":
+                logger.error("✗ Connection failed!")
+            elif pc.connectionState == "closed":
+                logger.info("Connection closed")
+        
+        @pc.on("iceconnectionstatechange")
+        async def on_iceconnectionstatechange():
+            logger.info(f"ICE connection state: {pc.iceConnectionState}")
+        
+        # Create offer
+        offer = await pc.createOffer()
+        await pc.setLocalDescription(offer)
+        
+        logger.info(f"Connecting to receiver at {receiver_url}...")
+        
+        # Send offer to receiver. The session (and its keep-alive connection)
+        # lives as long as the stream so later signaling can reuse it.
+        session = aiohttp.ClientSession()
         async with session.post(
             f"{receiver_url}/offer",
             json={
@@ -217,26 +464,25 @@ async def send_stream(receiver_url, camera_topic, resolution, fps):
             else:
                 logger.error(f"Failed to connect: {response.status}")
                 return
-    
-    # Keep connection alive
-    try:
+        
+        # Keep connection alive
         while pc.connectionState != "closed":
             await asyncio.sleep(1)
             
             # Send heartbeat every 5 seconds
             if pc.connectionState == "connected" and channel.readyState == "open":
                 try:
-                    stats = {
-                        "frames": ros_node.frame_count,
-                        "timestamp": time.time()
-                    }
-                    channel.send(json.dumps(stats))
+                    channel.send(HEARTBEAT.pack(ros_node.frame_count, time.time()))
                 except:
                     pass
     except KeyboardInterrupt:
         logger.info("Shutting down...")
     finally:
-        await pc.close()
+        if session is not None:
+            await session.close()
+        if pc is not None:
+            await pc.close()
+        executor.shutdown()
         ros_node.destroy_node()
         rclpy.shutdown()
 
@@ -248,10 +494,13 @@ def main():
     parser.add_argument("--camera-topic", default="/camera1/image_raw", help="ROS2 camera topic")
     parser.add_argument("--resolution", default="640x480", help="Video resolution (WxH)")
     parser.add_argument("--fps", type=int, default=30, help="Frames per second")
+    parser.add_argument("--nvenc", action="store_true", help="Encode H.264 with NVENC (needs PyAV/FFmpeg built with h264_nvenc)")
     args = parser.parse_args()
     
     # Parse resolution
     width, height = map(int, args.resolution.split('x'))
+    if width % 2 or height % 2:
+        parser.error("--resolution must have even width and height (yuv420p)")
     resolution = (width, height)
     
     receiver_url = f"http://{args.receiver_ip}:{args.receiver_port}"
@@ -265,7 +514,7 @@ def main():
     logger.info(f"Receiver: {receiver_url}")
     logger.info("=" * 60)
     
-    asyncio.run(send_stream(receiver_url, args.camera_topic, resolution, args.fps))
+    asyncio.run(send_stream(receiver_url, args.camera_topic, resolution, args.fps, args.nvenc))
 
 
 if __name__ == "__main__":
@@ -3,6 +3,8 @@ import aiohttp
 import json 
 import logging
 import argparse
+import queue
+import threading
 import numpy as np
 import cv2
 from aiortc import RTCPeerConnection, RTCConfiguration, RTCIceServer
@@ -20,9 +22,15 @@ class WebRTCClient:
         self.pc = None
         self.dc = None
         self.running = False
-        self.latest_frame = None
+        self.display = True
         self.frame_count = 0
         
+        # HighGUI calls block (and may pump the whole GUI event loop), so
+        # they run on their own thread fed by a 1-slot, drop-oldest queue.
+        # The thread is only started by run() when display is enabled.
+        self._display_q = queue.Queue(maxsize=1)
+        self._display_thread = None
+        
     async def connect(self):
         # Establish WebRTC connection to the server
         try:
@@ -128,13 +136,49 @@ class WebRTCClient:
     async def process_frame(self, frame: VideoFrame):
         """Process received video frame"""
         try:
-            # Convert VideoFrame to numpy array
-            img = frame.to_ndarray(format="bgr24")
-            
-            self.latest_frame = img
             self.frame_count += 1
             
+            if not self.display:
+                # Headless: nothing looks at the pixels, so skip the BGR conversion
+                if self.frame_count % 100 == 0:
+                    logger.info(f"Frames received: {self.frame_count}, Size: {frame.width}x{frame.height}")
+                return
+            
+            # Convert VideoFrame to numpy array (only kept while it's on screen)
+            img = frame.to_ndarray(format="bgr24")
+            
             # Display frame
+            self._show(img)
+            
+            # Log frame info periodically
+            if self.frame_count % 100 == 0:
+                logger.info(f"Frames received: {self.frame_count}, Size: {img.shape}")
+                
+        except Exception as e:
+            logger.error(f"Error processing frame: {e}")
+    
+    def _show(self, img):
+        """Queue img for the display thread, replacing a frame it hasn't shown yet"""
+        try:
+            self._display_q.put_nowait(img)
+        except queue.Full:
+            try:
+                self._display_q.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self._display_q.put_nowait(img)
+            except queue.Full:
+                pass
+    
+    def _display_loop(self):
+        """Show frames and handle key presses (runs in its own thread)"""
+        while True:
+            img = self._display_q.get()
+            if img is None:
+                cv2.destroyAllWindows()
+                continue
+            
             cv2.imshow("WebRTC Stream", img)
             
             # Handle key press (1ms wait)
@@ -147,13 +191,6 @@ class WebRTCClient:
                 filename = f"screenshot_{self.frame_count}.jpg"
                 cv2.imwrite(filename, img)
                 logger.info(f"Screenshot saved: {filename}")
-            
-            # Log frame info periodically
-            if self.frame_count % 100 == 0:
-                logger.info(f"Frames received: {self.frame_count}, Size: {img.shape}")
-                
-        except Exception as e:
-            logger.error(f"Error processing frame: {e}")
     
     def send_ping(self):
         """Send ping to measure RTT"""
@@ -175,6 +212,10 @@ class WebRTCClient:
     
     async def run(self, display=True):
         """Main run loop"""
+        self.display = display
+        if display and self._display_thread is None:
+            self._display_thread = threading.Thread(target=self._display_loop, daemon=True)
+            self._display_thread.start()
         if not await self.connect():
             logger.error("Failed to connect to server")
             return
@@ -204,7 +245,10 @@ class WebRTCClient:
         if self.pc:
             await self.pc.close()
         
-        cv2.destroyAllWindows()
+        # Windows belong to the display thread, so let it close them
+        # (headless OpenCV builds can't, so there is no thread to ask then)
+        if self._display_thread is not None:
+            self._show(None)
         logger.info(f"Total frames received: {self.frame_count}")
 
 
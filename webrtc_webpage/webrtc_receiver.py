@@ -6,121 +6,310 @@ Usage: python3 webrtc_receiver.py --port 8082
 
 import argparse
 import asyncio
+import gzip
+import hashlib
 import json
 import logging
 import os
+import re
+import struct
 from aiohttp import web
 from aiortc import RTCPeerConnection, RTCSessionDescription, RTCConfiguration, RTCIceServer, MediaStreamTrack
 from aiortc.contrib.media import MediaRelay
+from aiortc.mediastreams import MediaStreamError
 import cv2
 import numpy as np
 from av import VideoFrame
 import time
+import weakref
 
-logging.basicConfig(level=logging.INFO)
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj):
+        return json.dumps(obj).encode("utf-8")
+    _loads = json.loads
+
+# Quiet by default so per-connection/per-message logging costs nothing;
+# raise it with --log-level
+logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger(__name__)
 
+# Sender heartbeat: frame count (uint64) + sender time (float64), little-endian
+HEARTBEAT = struct.Struct('<Qd')
+
+# The video m-section of an SDP (up to the next m= line), and its direction
+_VIDEO_SECTION_RE = re.compile(r"^m=video.*?(?=^m=|\Z)", re.M | re.S)
+_DIRECTION_RE = re.compile(r"^a=(sendonly|sendrecv|recvonly|inactive)", re.M)
+
+# WebRTC configuration shared by every peer connection (never modified)
+_ICE_CONFIG = RTCConfiguration(
+    iceServers=[
+        RTCIceServer(urls=["stun:stun.l.google.com:19302"]),
+        RTCIceServer(urls=["stun:stun1.l.google.com:19302"])
+    ]
+)
+
+# /stats serves a cached snapshot rebuilt on this period (seconds), so the
+# cost is the same however many clients poll
+STATS_REFRESH_INTERVAL = 0.25
+_stats_bytes = b"{}"
+
+# Peer connections torn down at once on shutdown
+SHUTDOWN_CONCURRENCY = 32
+
+# Number of frame intervals averaged for the FPS metric
+FPS_WINDOW = 30
+
+# How often the sender connection's received byte count is sampled for bitrate
+BITRATE_INTERVAL_NS = 1_000_000_000
+
+
+def _update_fps(samples, head, count, total, interval_ns):
+    """
+    Record one frame interval in the FPS ring buffer.
+    
+    Keeps a running sum (add the new sample, subtract the one it overwrites),
+    so the mean is O(1) per frame; the sum is recomputed exactly once per lap
+    of the ring to stop rounding drift. Returns (new_head, new_count,
+    new_total, mean_fps). Compiled with numba when it's installed; the same
+    code runs as plain Python otherwise.
+    """
+    fps = 1e9 / interval_ns
+    if count == samples.shape[0]:
+        total -= samples[head]
+    else:
+        count += 1
+    samples[head] = fps
+    total += fps
+    head = (head + 1) % samples.shape[0]
+    if head == 0:
+        total = 0.0
+        for i in range(count):
+            total += samples[i]
+    return head, count, total, total / count
+
+
+try:
+    from numba import njit
+except ImportError:
+    pass
+else:
+    _update_fps = njit(cache=True)(_update_fps)
+
 
 class VideoMetricsTracker:
     """Tracks video metrics for display"""
     
     def __init__(self):
         self.frame_count = 0
-        self.start_time = None
-        self.last_frame_time = None
-        self.fps_samples = []
+        # Monotonic nanosecond clock: integer math, immune to wall-clock jumps
+        self.start_time_ns = None
+        self.last_frame_time_ns = None
+        self.fps_samples = np.zeros(FPS_WINDOW, dtype=np.float64)
+        self.fps_head = 0
+        self.fps_count = 0
+        self.fps_total = 0.0
         self.latency_samples = []
         self.bitrate_samples = []
         self.current_fps = 0
         self.current_latency = 0
         self.current_bitrate = 0
-        self.total_bytes = 0
+        # Last (monotonic ns, bytes received) sample the bitrate was taken from
+        self.last_bytes_time_ns = None
+        self.last_bytes_received = 0
+        # Frames dropped by BoundedRelayTrack across this sender's viewers
+        self.dropped_frames = 0
         
-    def update_frame(self, frame_size_bytes):
+    def update_frame(self):
         """Update metrics when frame is received"""
-        now = time.time()
+        now = time.monotonic_ns()
         
-        if self.start_time is None:
-            self.start_time = now
+        if self.start_time_ns is None:
+            self.start_time_ns = now
         
         self.frame_count += 1
-        self.total_bytes += frame_size_bytes
         
         # Calculate FPS
-        if self.last_frame_time is not None:
-            frame_interval = now - self.last_frame_time
-            if frame_interval > 0:
-                fps = 1.0 / frame_interval
-                self.fps_samples.append(fps)
-                if len(self.fps_samples) > 30:
-                    self.fps_samples.pop(0)
-                self.current_fps = sum(self.fps_samples) / len(self.fps_samples)
-        
-        # Calculate bitrate (last 1 second)
-        elapsed = now - self.start_time
-        if elapsed > 0:
-            self.current_bitrate = (self.total_bytes * 8) / (elapsed * 1000)  # kbps
-        
-        self.last_frame_time = now
+        if self.last_frame_time_ns is not None:
+            interval_ns = now - self.last_frame_time_ns
+            if interval_ns > 0:
+                head, count, total, fps = _update_fps(
+                    self.fps_samples, self.fps_head, self.fps_count, self.fps_total, interval_ns
+                )
+                # Plain Python numbers: without numba these come out as np.float64,
+                # which orjson refuses to serialize
+                self.fps_head = int(head)
+                self.fps_count = int(count)
+                self.fps_total = float(total)
+                self.current_fps = float(fps)
+        
+        self.last_frame_time_ns = now
+    
+    def update_bytes_received(self, bytes_received):
+        """Update bitrate from the connection's running count of received bytes"""
+        now = time.monotonic_ns()
+        if self.last_bytes_time_ns is not None:
+            elapsed_ns = now - self.last_bytes_time_ns
+            if elapsed_ns > 0:
+                delta = bytes_received - self.last_bytes_received
+                self.current_bitrate = delta * 8_000_000 / elapsed_ns  # kbps
+        self.last_bytes_time_ns = now
+        self.last_bytes_received = bytes_received
     
     def get_metrics(self):
         """Get current metrics as dict"""
-        elapsed = time.time() - self.start_time if self.start_time else 0
+        elapsed = (time.monotonic_ns() - self.start_time_ns) / 1e9 if self.start_time_ns else 0
         return {
             "frames": self.frame_count,
             "fps": round(self.current_fps, 2),
             "latency": round(self.current_latency, 2),
             "bitrate": round(self.current_bitrate, 2),
             "uptime": round(elapsed, 1),
+            "dropped_frames": self.dropped_frames,
             "timestamp": time.time()
         }
 
 
+class BoundedRelayTrack(MediaStreamTrack):
+    """
+    Per-viewer track holding at most max_depth frames.
+    
+    A pump task moves frames from the relay subscription into a small queue;
+    when the viewer falls behind the oldest frame is dropped (and counted),
+    so latency stays bounded instead of growing with the backlog.
+    """
+    kind = "video"
+    
+    def __init__(self, source, tracker, max_depth=2):
+        super().__init__()
+        self._source = source
+        self._tracker = tracker
+        self._queue = asyncio.Queue(maxsize=max_depth)
+        self.dropped_frames = 0
+        self._pump_task = asyncio.ensure_future(self._pump())
+    
+    def _put(self, item):
+        """Queue item, dropping the oldest frame if the queue is full"""
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped_frames += 1
+            self._tracker.dropped_frames += 1
+        self._queue.put_nowait(item)
+    
+    async def _pump(self):
+        try:
+            while True:
+                self._put(await self._source.recv())
+        except MediaStreamError:
+            # Source ended: wake the viewer with the end marker
+            self._put(None)
+    
+    async def recv(self):
+        if self.readyState != "live":
+            raise MediaStreamError
+        frame = await self._queue.get()
+        if frame is None:
+            self.stop()
+            raise MediaStreamError
+        return frame
+    
+    def stop(self):
+        super().stop()
+        self._pump_task.cancel()
+        self._source.stop()
+
+
 # Global variables
-sender_pcs = set()  # Connections from senders
-viewer_pcs = set()  # Connections from browser viewers
-metrics_tracker = VideoMetricsTracker()
+# Weak sets, so a connection whose close callback never fired can still be
+# collected; the explicit discards keep removal prompt in the normal case
+sender_pcs = weakref.WeakSet()  # Connections from senders
+viewer_pcs = weakref.WeakSet()  # Connections from browser viewers
 active_channels = set()
 relay = MediaRelay()  # Use MediaRelay to relay tracks to multiple viewers
-video_track = None  # Store the incoming video track from sender
+source_tracks = {}  # Sender pc -> its raw video track; viewers each subscribe to one
+sender_metrics = {}  # Sender pc -> VideoMetricsTracker for its video track
+
+
+def _bytes_received(report):
+    """Encoded bytes received so far, from an RTCPeerConnection.getStats() report"""
+    inbound = [getattr(stats, "bytesReceived", None) for stats in report.values()
+               if stats.type == "inbound-rtp" and stats.kind == "video"]
+    if inbound and None not in inbound:
+        return sum(inbound)
+    # aiortc's inbound-rtp stats may not carry bytesReceived; the transport
+    # count (media plus RTCP) is the closest figure it does expose
+    return sum(getattr(stats, "bytesReceived", 0) for stats in report.values()
+               if stats.type == "transport")
+
+
+async def consume_metrics(pc, track, tracker):
+    """Feed every frame of a relayed sender track into that sender's tracker"""
+    next_sample_ns = 0
+    try:
+        while pc.connectionState != "closed":
+            await track.recv()
+            tracker.update_frame()
+            now = time.monotonic_ns()
+            if now >= next_sample_ns:
+                next_sample_ns = now + BITRATE_INTERVAL_NS
+                try:
+                    report = await pc.getStats()
+                except Exception:
+                    # The pc may be closing or failing; keep counting frames
+                    logger.debug("getStats failed; skipping bitrate sample", exc_info=True)
+                    continue
+                tracker.update_bytes_received(_bytes_received(report))
+    except MediaStreamError:
+        pass
 
 
 async def offer_handler(request):
     """Handle incoming WebRTC offer from sender OR browser viewer"""
-    params = await request.json()
+    params = _loads(await request.read())
     offer = RTCSessionDescription(sdp=params["sdp"], type=params["type"])
     
-    # Determine if this is from a sender or viewer
+    # Determine if this is from a sender or viewer by the direction of the
+    # video m-section only (an audio section's direction doesn't count)
     # Sender has "a=sendonly" or "a=sendrecv" (they're sending video)
     # Viewer has "a=recvonly" (they're receiving video)
-    is_sender = ("a=sendonly" in offer.sdp) or ("a=sendrecv" in offer.sdp and "m=video" in offer.sdp)
+    video = _VIDEO_SECTION_RE.search(offer.sdp)
+    direction = _DIRECTION_RE.search(video.group(0)) if video else None
+    is_sender = direction is not None and direction.group(1) in ("sendonly", "sendrecv")
     
-    logger.info(f"Received offer from {'sender' if is_sender else 'viewer'}")
-    
-    # Configure WebRTC
-    config = RTCConfiguration(
-        iceServers=[
-            RTCIceServer(urls=["stun:stun.l.google.com:19302"]),
-            RTCIceServer(urls=["stun:stun1.l.google.com:19302"])
-        ]
-    )
+    logger.info("Received offer from %s", "sender" if is_sender else "viewer")
     
-    pc = RTCPeerConnection(configuration=config)
+    pc = RTCPeerConnection(configuration=_ICE_CONFIG)
     
     if is_sender:
         sender_pcs.add(pc)
     else:
         viewer_pcs.add(pc)
-        # Add video track BEFORE setting remote description for viewers
-        if video_track is not None:
+        # Add video track BEFORE setting remote description for viewers.
+        # Each viewer gets its own unbuffered subscription, so it always pulls
+        # the newest frame and a slow viewer can't hold up the others.
+        # Viewers watch the most recently connected sender.
+        source_pc = next(reversed(source_tracks), None)
+        if source_pc is not None:
             logger.info("Adding video track to viewer connection")
-            pc.addTrack(video_track)
+            pc.addTrack(BoundedRelayTrack(
+                relay.subscribe(source_tracks[source_pc], buffered=False),
+                sender_metrics[source_pc],
+                max_depth=2
+            ))
         else:
             logger.warning("No video track available - viewer must connect after sender")
     
     @pc.on("connectionstatechange")
     async def on_connectionstatechange():
-        logger.info(f"Connection state: {pc.connectionState}")
+        logger.info("Connection state: %s", pc.connectionState)
         if pc.connectionState == "connected":
             logger.info("✓ Connection established!")
         elif pc.connectionState == "failed":
@@ -128,44 +317,71 @@ async def offer_handler(request):
             await pc.close()
             sender_pcs.discard(pc)
             viewer_pcs.discard(pc)
+            source_tracks.pop(pc, None)
+            sender_metrics.pop(pc, None)
         elif pc.connectionState == "closed":
             logger.info("Connection closed")
             sender_pcs.discard(pc)
             viewer_pcs.discard(pc)
+            source_tracks.pop(pc, None)
+            sender_metrics.pop(pc, None)
+            # Closing a pc doesn't stop its outgoing tracks; stop them so the
+            # viewer's pump and relay subscription go away too
+            for sender in pc.getSenders():
+                if sender.track is not None:
+                    sender.track.stop()
     
     @pc.on("iceconnectionstatechange")
     async def on_iceconnectionstatechange():
-        logger.info(f"ICE connection state: {pc.iceConnectionState}")
+        logger.info("ICE connection state: %s", pc.iceConnectionState)
     
     if is_sender:
         # This is a sender - receive their video track
         @pc.on("track")
         def on_track(track):
-            global video_track
-            logger.info(f"Received track from sender: {track.kind}")
+            logger.info("Received track from sender: %s", track.kind)
             if track.kind == "video":
-                # Store the video track so viewers can access it
-                video_track = relay.subscribe(track)
+                # Store the video track so viewers can subscribe to it
+                tracker = VideoMetricsTracker()
+                sender_metrics[pc] = tracker
+                source_tracks[pc] = track
                 logger.info("Video track is now available for viewers")
+                # Metrics get their own unbuffered subscription so they never
+                # take frames from the viewers
+                metrics_task = asyncio.ensure_future(
+                    consume_metrics(pc, relay.subscribe(track, buffered=False), tracker)
+                )
+            else:
+                metrics_task = None
             
             @track.on("ended")
             async def on_ended():
                 logger.warning("Sender track ended")
-                video_track = None
+                if metrics_task is not None:
+                    metrics_task.cancel()
+                if source_tracks.get(pc) is track:
+                    del source_tracks[pc]
+                    sender_metrics.pop(pc, None)
     
     @pc.on("datachannel")
     def on_datachannel(channel):
-        logger.info(f"Data channel established: {channel.label}")
+        logger.info("Data channel established: %s", channel.label)
         active_channels.add(channel)
         
         @channel.on("message")
         def on_message(message):
+            if isinstance(message, bytes) and len(message) == HEARTBEAT.size:
+                frames, timestamp = HEARTBEAT.unpack(message)
+                logger.debug("Sender stats: frames=%d timestamp=%f", frames, timestamp)
+                return
+            # orjson takes str and bytes alike, so no decode/encode step
             try:
-                data = json.loads(message)
-                if "frames" in data:
-                    logger.debug(f"Sender stats: {data}")
-            except:
-                logger.debug(f"Received: {message}")
+                data = _loads(message)
+            except ValueError:
+                logger.debug("Received: %s", message)
+                return
+            if isinstance(data, dict) and "frames" in data:
+                logger.debug("Sender stats: %s", data)
         
         @channel.on("close")
         def on_close():
@@ -181,39 +397,37 @@ async def offer_handler(request):
     
     return web.Response(
         content_type="application/json",
-        text=json.dumps({
+        body=_dumps({
             "sdp": pc.localDescription.sdp,
             "type": pc.localDescription.type
         })
     )
 
 
+def _cached_response(request, bodies, etag, content_type):
+    """Serve a precompressed asset, answering 304 when the browser's copy is current"""
+    accepted = {part.split(";")[0].strip() for part in request.headers.get("Accept-Encoding", "").split(",")}
+    encoding = next((e for e in ("br", "gzip") if e in accepted and e in bodies), "identity")
+    
+    # Each encoding is a distinct representation and needs its own strong ETag
+    if encoding != "identity":
+        etag = f'{etag[:-1]}-{encoding}"'
+    headers = {"ETag": etag, "Cache-Control": STATIC_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if request.headers.get("If-None-Match") == etag:
+        return web.Response(status=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return web.Response(body=bodies[encoding], content_type=content_type, charset="utf-8", headers=headers)
+
+
 async def index(request):
     """Serve the main HTML page"""
-    html_path = os.path.join(os.path.dirname(__file__), "viewer.html")
-    
-    if not os.path.exists(html_path):
-        # Return embedded HTML if file doesn't exist
-        html = get_embedded_html()
-    else:
-        with open(html_path, "r") as f:
-            html = f.read()
-    
-    return web.Response(content_type="text/html", text=html)
+    return _cached_response(request, INDEX_BODIES, INDEX_ETAG, "text/html")
 
 
 async def javascript_handler(request):
     """Serve the JavaScript file"""
-    js_path = os.path.join(os.path.dirname(__file__), "viewer.js")
-    
-    if not os.path.exists(js_path):
-        # Return embedded JS if file doesn't exist
-        js = get_embedded_js()
-    else:
-        with open(js_path, "r") as f:
-            js = f.read()
-    
-    return web.Response(content_type="application/javascript", text=js)
+    return _cached_response(request, JS_BODIES, JS_ETAG, "application/javascript")
 
 
 def get_embedded_html():
@@ -822,37 +1036,112 @@ window.addEventListener('load', () => {
 """
 
 
+def _load_or_fallback(path, fallback):
+    """Read an asset once at startup, falling back to the embedded copy"""
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    return fallback.encode("utf-8")
+
+
+def _etag(body):
+    """Strong ETag from a content hash"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _precompress(body):
+    """Compress an asset once per supported Content-Encoding ("identity" is raw)"""
+    bodies = {"identity": body, "gzip": gzip.compress(body, 9)}
+    if brotli is not None:
+        bodies["br"] = brotli.compress(body, quality=11)
+    return bodies
+
+
+# Page assets are read (or built from the embedded copies) and compressed
+# once at import, so requests don't touch the filesystem or a compressor
+_HERE = os.path.dirname(os.path.abspath(__file__))
+INDEX_BYTES = _load_or_fallback(os.path.join(_HERE, "viewer.html"), get_embedded_html())
+INDEX_ETAG = _etag(INDEX_BYTES)
+INDEX_BODIES = _precompress(INDEX_BYTES)
+JS_BYTES = _load_or_fallback(os.path.join(_HERE, "viewer.js"), get_embedded_js())
+JS_ETAG = _etag(JS_BYTES)
+JS_BODIES = _precompress(JS_BYTES)
+STATIC_CACHE_CONTROL = "public, max-age=3600"
+
+
+def _build_stats():
+    """Serialize the current statistics, with metrics for the sender viewers are shown"""
+    shown = next(reversed(source_tracks), None)
+    tracker = sender_metrics.get(shown) or VideoMetricsTracker()
+    return _dumps({
+        "sender_connections": len(sender_pcs),
+        "viewer_connections": len(viewer_pcs),
+        "video_available": bool(source_tracks),
+        **tracker.get_metrics()
+    })
+
+
+async def refresh_stats():
+    """Rebuild the /stats snapshot every STATS_REFRESH_INTERVAL seconds"""
+    global _stats_bytes
+    while True:
+        await asyncio.sleep(STATS_REFRESH_INTERVAL)
+        try:
+            _stats_bytes = _build_stats()
+        except Exception:
+            # Keep the last good snapshot and try again next tick
+            logger.exception("Failed to build stats snapshot")
+
+
 async def stats_handler(request):
-    """Return current statistics"""
-    return web.Response(
-        content_type="application/json",
-        text=json.dumps({
-            "sender_connections": len(sender_pcs),
-            "viewer_connections": len(viewer_pcs),
-            "video_available": video_track is not None,
-            **metrics_tracker.get_metrics()
-        })
-    )
+    """Return current statistics (a snapshot at most STATS_REFRESH_INTERVAL old)"""
+    return web.Response(content_type="application/json", body=_stats_bytes)
+
+
+async def on_startup(app):
+    """Build the first stats snapshot and keep it fresh"""
+    global _stats_bytes
+    _stats_bytes = _build_stats()
+    app["stats_task"] = asyncio.ensure_future(refresh_stats())
 
 
 async def on_shutdown(app):
     """Cleanup on shutdown"""
     logger.info("Shutting down...")
+    app["stats_task"].cancel()
     all_pcs = list(sender_pcs) + list(viewer_pcs)
-    coros = [pc.close() for pc in all_pcs]
-    await asyncio.gather(*coros)
+    # Close in parallel but capped, and keep going if one close fails
+    sem = asyncio.Semaphore(SHUTDOWN_CONCURRENCY)
+    
+    async def _close(pc):
+        async with sem:
+            await pc.close()
+    
+    await asyncio.gather(*(_close(pc) for pc in all_pcs), return_exceptions=True)
     sender_pcs.clear()
     viewer_pcs.clear()
 
 
 def main():
+    # Prefer uvloop's libuv-based event loop when available
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+    
     parser = argparse.ArgumentParser(description="WebRTC Video Receiver with Web Interface")
     parser.add_argument("--host", default="0.0.0.0", help="Host to bind to")
     parser.add_argument("--port", type=int, default=8082, help="Port to bind to")
+    parser.add_argument("--log-level", default="WARNING",
+                        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="Logging level (INFO shows connection events and the startup banner)")
     args = parser.parse_args()
+    logging.getLogger().setLevel(args.log_level)
     
-    # Setup web application
-    app = web.Application()
+    # Setup web application; signaling bodies are SDP, far below 256 KB
+    app = web.Application(client_max_size=256 * 1024)
+    app.on_startup.append(on_startup)
     app.on_shutdown.append(on_shutdown)
     app.router.add_get("/", index)
     app.router.add_get("/viewer.js", javascript_handler)
@@ -862,8 +1151,8 @@ def main():
     logger.info("=" * 60)
     logger.info("WebRTC Video Receiver with Web Interface")
     logger.info("=" * 60)
-    logger.info(f"Server URL: http://{args.host}:{args.port}")
-    logger.info(f"Web Viewer: http://localhost:{args.port}/")
+    logger.info("Server URL: http://%s:%d", args.host, args.port)
+    logger.info("Web Viewer: http://localhost:%d/", args.port)
     logger.info("")
     logger.info("Usage:")
     logger.info("  1. Start this receiver")
@@ -872,7 +1161,8 @@ def main():
     logger.info("=" * 60)
     
     try:
-        web.run_app(app, host=args.host, port=args.port)
+        # No per-request access log formatting on these tiny endpoints
+        web.run_app(app, host=args.host, port=args.port, access_log=None)
     except KeyboardInterrupt:
         logger.info("Stopped by user")
 
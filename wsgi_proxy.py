@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+"""
+WSGI entry point for running flask_proxy under gunicorn with gevent workers
+Usage:
+    gunicorn -w $(nproc) -k gevent --worker-connections 1000 --keep-alive 30 -b 0.0.0.0:8080 wsgi_proxy:app
+"""
+
+# Patch sockets before urllib3 is imported so the proxy's pooled
+# connections yield to other greenlets instead of blocking the worker
+from gevent import monkey
+monkey.patch_all()
+
+from flask_proxy import app  # noqa: E402
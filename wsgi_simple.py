@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+"""
+WSGI entry point for running python_simple_server under gunicorn with gevent workers
+Usage:
+    gunicorn -w 1 -k gevent --worker-connections 1000 --keep-alive 30 -b 0.0.0.0:5000 wsgi_simple:app
+"""
+
+# Patch before the app is imported so blocking calls yield to other greenlets
+from gevent import monkey
+monkey.patch_all()
+
+from python_simple_server import app  # noqa: E402